@@ -2,13 +2,27 @@
 FastAPI Server for Banner Analysis
 Keeps Python process alive and models loaded for fast analysis
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Header
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 from banner_analyzer import BannerAnalyzer
+from job_queue import JobManager, Overloaded
+from image_io import ImageTooLarge, image_dimensions
+from result_cache import ResultCache
+from worker_pool import WorkerPool
+from settings import analyzer_config
+import metrics
+import tracing
+from typing import List, Optional
+import asyncio
+import hashlib
+import hmac
+import json
 import os
-import tempfile
+import threading
+import time
 import sys
 
 app = FastAPI(title="Banner Analyzer API", version="1.0.0")
@@ -25,23 +39,265 @@ app.add_middleware(
 # Global analyzer - loaded once at startup
 analyzer = None
 
+# With AI_WORKER_PROCESSES > 0 analyses run in a pool of analyzer processes
+WORKER_PROCESSES = int(os.environ.get("AI_WORKER_PROCESSES", "0"))
+pool = None
+
+# Analyses run here, never on the event loop (in pool mode these threads
+# only wait on worker processes, so keep enough to feed every worker).
+# At most AI_MAX_QUEUE wait for a thread; past that requests get 429 right away
+jobs = JobManager(
+    max_workers=int(os.environ.get("AI_MAX_WORKERS", str(max(2, WORKER_PROCESSES * 2)))),
+    max_queue=int(os.environ.get("AI_MAX_QUEUE", "32"))
+)
+
+# Seconds an analysis may wait in the queue: one that can't start in time is
+# refused with 503, and one still queued when it passes is dropped before OCR
+# (the default matches how long the Node proxy keeps waiting)
+REQUEST_DEADLINE = float(os.environ.get("AI_REQUEST_DEADLINE", "120"))
+
+# Uploads are read in chunks and rejected once they pass this size
+MAX_UPLOAD_BYTES = int(os.environ.get("AI_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Whole request bodies are refused above these sizes before they are received
+# (Starlette spools multipart uploads to a temp file before any endpoint runs)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+MAX_BATCH_BYTES = int(os.environ.get("AI_MAX_BATCH_BYTES", str(100 * 1024 * 1024)))
+# How often a ?wait request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+# Checked from the image header, before any pixels are decoded
+MAX_IMAGE_PIXELS = int(os.environ.get("AI_MAX_IMAGE_PIXELS", str(50_000_000)))
+MAX_IMAGE_SIDE = int(os.environ.get("AI_MAX_IMAGE_SIDE", "20000"))
+
+# Re-uploads of the same banner skip analysis entirely
+cache = ResultCache(
+    max_entries=int(os.environ.get("AI_CACHE_SIZE", "256")),
+    ttl=int(os.environ.get("AI_CACHE_TTL", str(24 * 3600))),
+    disk_dir=os.environ.get("AI_CACHE_DIR") or None
+)
+
+# Tracing: requests with an X-Trace header (or a random AI_TRACE_SAMPLE_RATE share)
+# get a Chrome trace, plus a sampled stack profile for "X-Trace: profile".
+# The header is only honoured with X-Trace-Token matching AI_TRACE_TOKEN (unset = ignored)
+TRACE_SAMPLE_RATE = float(os.environ.get("AI_TRACE_SAMPLE_RATE", "0"))
+TRACE_PROFILE_SAMPLED = os.environ.get("AI_TRACE_PROFILE", "0") == "1"
+TRACE_DIR = os.environ.get("AI_TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces"))
+TRACE_TOKEN = os.environ.get("AI_TRACE_TOKEN", "")
+TRACE_MAX_FILES = int(os.environ.get("AI_TRACE_MAX_FILES", "200"))
+
+# /ready stays 503 until the OCR models have run a warm-up inference (and,
+# unless AI_READY_REQUIRE_LLM=0, the Ollama model is loaded)
+READY_REQUIRES_LLM = os.environ.get("AI_READY_REQUIRE_LLM", "1") != "0"
+warmup = {"done": False, "seconds": None, "error": None}
+
+def ocr_loaded():
+    """True once the OCR models are loaded (in every worker, in pool mode)"""
+    if analyzer is None:
+        return False
+    if pool:
+        return pool.ready()
+    return bool(analyzer.paddle_loaded if analyzer.ocr_backend == 'paddle' else analyzer.reader_loaded)
+
+def readiness():
+    """Whether this instance should receive traffic, and what it is still waiting for"""
+    ocr_warm = pool.ready() if pool else warmup["done"]
+    llm_loaded = bool(analyzer and analyzer.llm and analyzer.llm.preloaded_model)
+    # Without the ollama package there is no model to wait for (rules-only results)
+    llm_ok = llm_loaded or not READY_REQUIRES_LLM or (analyzer is not None and analyzer.llm is None)
+    return {
+        "ready": analyzer is not None and ocr_warm and llm_ok,
+        "ocr_warm": ocr_warm,
+        "llm_loaded": llm_loaded,
+        "warmup_seconds": warmup["seconds"],
+        "warmup_error": warmup["error"]
+    }
+
+def warm_up_analyzer():
+    """Load and exercise the OCR models off the event loop (single-process mode)"""
+    try:
+        warmup["seconds"] = round(analyzer.warm_up(), 2)
+        warmup["done"] = True
+    except Exception as e:
+        warmup["error"] = str(e)
+        print(f"❌ Warm-up failed, models will load on first request: {e}", file=sys.stderr)
+
+def local_analyzer():
+    """The analyzer doing the work in this process; None in pool mode, where the
+    workers' analyzers own the strategy stats, hash index and LLM client"""
+    return None if pool else analyzer
+
+def register_gauges():
+    """Gauges (and counters kept elsewhere) read at scrape time from the job queue, caches and loaded models"""
+    def job_counts(status):
+        return lambda: jobs.stats()[status]
+    
+    def models_loaded():
+        if analyzer is None:
+            return {("ocr",): 0, ("llm",): 0}
+        return {("ocr",): int(ocr_loaded()), ("llm",): int(analyzer.ollama_model is not None)}
+    
+    def llm_status():
+        local = local_analyzer()
+        return local.llm.status() if local and local.llm else {}
+    
+    def llm_endpoints(key):
+        # Only an LLMRouter (OLLAMA_HOSTS) reports per-endpoint state
+        def read():
+            status = llm_status()
+            # bool -> int for "healthy"; None (no samples yet) is skipped by the gauge
+            return {(e["host"],): int(e[key]) if isinstance(e[key], bool) else e[key]
+                    for e in status.get("endpoints", [])}
+        return read
+    
+    def phash_stat(key):
+        def read():
+            local = local_analyzer()
+            return local.phash_index.stats()[key] if local and local.phash_index else None
+        return read
+    
+    metrics.REGISTRY.gauge("banner_jobs_in_flight", "Analyses currently running", job_counts("running"))
+    metrics.REGISTRY.gauge("banner_jobs_queued", "Analyses waiting for a free worker", job_counts("queued"))
+    metrics.REGISTRY.gauge("banner_job_workers", "Analyses that can run at once", job_counts("max_workers"))
+    metrics.REGISTRY.gauge("banner_job_expected_wait_seconds", "Estimated queue wait for a new analysis", job_counts("expected_wait"))
+    metrics.REGISTRY.callback_counter("banner_cache_hits_total", "Result cache hits", lambda: cache.stats()["hits"])
+    metrics.REGISTRY.callback_counter("banner_cache_misses_total", "Result cache misses", lambda: cache.stats()["misses"])
+    metrics.REGISTRY.gauge("banner_cache_hit_ratio", "Result cache hit ratio since start", lambda: cache.stats()["hit_ratio"])
+    metrics.REGISTRY.gauge("banner_cache_entries", "Results held in memory", lambda: cache.stats()["entries"])
+    # Not reported in pool mode; banner_results_total{method="phash_duplicate"} counts hits there
+    metrics.REGISTRY.callback_counter(
+        "banner_phash_hits_total", "Duplicate banners answered from the perceptual hash index", phash_stat("hits")
+    )
+    metrics.REGISTRY.callback_counter(
+        "banner_phash_rejected_total", "Perceptual hash candidates whose OCR text differed", phash_stat("rejected")
+    )
+    metrics.REGISTRY.gauge("banner_phash_entries", "Banners in the perceptual hash index", phash_stat("entries"))
+    metrics.REGISTRY.gauge("banner_model_loaded", "1 when the model is loaded and usable", models_loaded, labels=("component",))
+    metrics.REGISTRY.gauge("banner_ready", "1 when /ready would accept traffic", lambda: int(readiness()["ready"]))
+    metrics.REGISTRY.gauge("banner_llm_outstanding", "LLM calls in flight per Ollama endpoint", llm_endpoints("outstanding"), labels=("host",))
+    metrics.REGISTRY.gauge("banner_llm_healthy", "1 while an Ollama endpoint is in rotation", llm_endpoints("healthy"), labels=("host",))
+    metrics.REGISTRY.gauge("banner_llm_first_token_p95_seconds", "p95 time to first token per Ollama endpoint", llm_endpoints("first_token_p95"), labels=("host",))
+    metrics.REGISTRY.callback_counter(
+        "banner_llm_hedges_total", "LLM calls duplicated to a second endpoint",
+        lambda: llm_status().get("hedges")
+    )
+    metrics.REGISTRY.gauge(
+        "banner_pool_workers_alive", "Live analyzer worker processes",
+        lambda: sum(w["alive"] for w in pool.stats()["workers"]) if pool else None
+    )
+
+register_gauges()
+
+class RequestLatencyMiddleware:
+    """Records banner_http_request_seconds when the response starts
+    
+    Plain ASGI rather than @app.middleware("http"): that wrapper hides client
+    disconnects from the endpoints, which need them to cancel abandoned work.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        
+        async def send_recording(message):
+            if message["type"] == "http.response.start":
+                # Route templates (/jobs/{job_id}) keep the label set small
+                route = scope.get("route")
+                path = route.path if route is not None else "unmatched"
+                metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], path, str(message["status"]))
+            await send(message)
+        
+        await self.app(scope, receive, send_recording)
+
+class BodyLimitMiddleware:
+    """Answers 413 for request bodies above the limit of their path
+    
+    Checked from Content-Length before anything is read, and by counting the
+    body as it arrives for chunked requests (or a Content-Length that lies).
+    """
+    
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits  # path -> max body bytes
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request too large: limit is {limit // (1024 * 1024)}MB"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+        received = 0
+        
+        async def receive_counted():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing, which passes HTTPException through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, receive_counted, send)
+
+app.add_middleware(RequestLatencyMiddleware)
+# Added last so it runs first, before any body is read
+app.add_middleware(BodyLimitMiddleware, limits={
+    "/analyze": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/analyze/stream": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    "/analyze/batch": MAX_BATCH_BYTES
+})
+
 @app.on_event("startup")
 async def startup_event():
     """Load models once at startup"""
-    global analyzer
+    global analyzer, pool
     print("=" * 60, file=sys.stderr)
     print("🚀 Starting Banner Analyzer FastAPI Server...", file=sys.stderr)
     print("=" * 60, file=sys.stderr)
     
     try:
-        print("📦 Loading Banner Analyzer with EasyOCR...", file=sys.stderr)
-        analyzer = BannerAnalyzer(ocr_backend='easy')
-        print(f"✅ Banner Analyzer ready! Backend: {analyzer.ocr_backend}", file=sys.stderr)
+        config = analyzer_config()
+        print(f"📦 Loading Banner Analyzer with {config['ocr_backend']} OCR...", file=sys.stderr)
+        analyzer = BannerAnalyzer.from_config(config)
+        if analyzer.llm:
+            # Model discovery + preload happen in the background so startup isn't blocked
+            analyzer.llm.start(preload=True)
+        
+        if WORKER_PROCESSES > 0:
+            # Workers warm up their own models; keep-alive is driven from this process
+            pool = WorkerPool(WORKER_PROCESSES, config)
+            pool.start()
+        else:
+            # The server answers /health meanwhile; /ready waits for this
+            threading.Thread(target=warm_up_analyzer, name="warm-up", daemon=True).start()
+        
+        print(f"✅ Banner Analyzer started, warming up (see /ready). Backend: {analyzer.ocr_backend}", file=sys.stderr)
         print("=" * 60, file=sys.stderr)
     except Exception as e:
         print(f"❌ Failed to load analyzer: {e}", file=sys.stderr)
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop accepting queued analyses"""
+    jobs.shutdown()
+    if pool:
+        pool.shutdown()
+    if analyzer and analyzer.llm:
+        analyzer.llm.stop()
+    if analyzer:
+        analyzer.scheduler.flush()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -50,18 +306,295 @@ async def root():
 @app.get("/health")
 async def health():
     """Detailed health check"""
+    # In pool mode the hash index, strategy stats and LLM client live in the workers
+    local = local_analyzer()
     return {
         "status": "healthy",
-        "analyzer_loaded": analyzer is not None,
-        "ocr_backend": analyzer.ocr_backend if analyzer else None
+        "analyzer_loaded": ocr_loaded(),
+        "readiness": readiness(),
+        "ocr_backend": analyzer.ocr_backend if analyzer else None,
+        "jobs": jobs.stats(),
+        "cache": cache.stats(),
+        "phash_index": local.phash_index.stats() if local and local.phash_index else None,
+        "ocr_strategies": local.scheduler.stats() if local else None,
+        "llm": local.llm.status() if local and local.llm else None,
+        "pool": pool.stats() if pool else None
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once models are loaded and warm, 503 until then"""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of latency histograms, queue and cache state"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+async def read_upload(file):
+    """Read an upload into memory, failing fast with 413 once it exceeds MAX_UPLOAD_BYTES"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large: limit is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB"
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def dimension_error(content):
+    """Why an image is too large to analyze, or None (unreadable headers are left to the decoder)"""
+    try:
+        size = image_dimensions(content)
+    except ImageTooLarge:
+        # PIL won't report sizes past ~179 megapixels, well above the default cap
+        metrics.REJECTED.inc("image_pixels")
+        return f"Image too large: limit is {MAX_IMAGE_PIXELS // 1_000_000} megapixels"
+    if size is None:
+        return None
+    width, height = size
+    if max(width, height) > MAX_IMAGE_SIDE:
+        metrics.REJECTED.inc("image_side")
+        return f"Image too large: {width}x{height}, limit is {MAX_IMAGE_SIDE}px per side"
+    if width * height > MAX_IMAGE_PIXELS:
+        metrics.REJECTED.inc("image_pixels")
+        return f"Image too large: {width}x{height}, limit is {MAX_IMAGE_PIXELS // 1_000_000} megapixels"
+    return None
+
+def check_dimensions(content):
+    error = dimension_error(content)
+    if error:
+        raise HTTPException(status_code=413, detail=error)
+
+def request_deadline(queued_at, deadline=None):
+    return queued_at + (deadline or REQUEST_DEADLINE)
+
+def submit_job(fn, *args, **kwargs):
+    """jobs.submit, answering overload with 429 (queue full) or 503 (deadline can't be met)"""
+    try:
+        return jobs.submit(fn, *args, **kwargs)
+    except Overloaded as e:
+        metrics.REJECTED.inc(e.reason)
+        print(f"🚦 Rejected ({e.reason}), retry after {e.retry_after}s", file=sys.stderr)
+        raise HTTPException(
+            status_code=429 if e.reason == "queue_full" else 503,
+            detail="Too many analyses queued" if e.reason == "queue_full" else "Analysis would not start before the deadline",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def cancel_job(job, reason):
+    """Stop a job nobody is waiting for any more (a running analysis stops at its next checkpoint)"""
+    if job.finished:
+        return
+    status = jobs.cancel(job)
+    print(f"🛑 Cancelling job {job.id} ({reason}, was {status})", file=sys.stderr)
+    if status == "queued":
+        # Never reaches the analyzer, so no cancelled result will count it
+        metrics.CANCELLED.inc("queued")
+
+async def wait_for_job(job, timeout, request):
+    """Wait up to timeout seconds for job; True if it finished
+    
+    If the client disconnects meanwhile the job is cancelled.
+    """
+    future = asyncio.wrap_future(job.future)
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        done, _ = await asyncio.wait({future}, timeout=min(remaining, DISCONNECT_POLL_SECONDS))
+        if done:
+            return True
+        if await request.is_disconnected():
+            cancel_job(job, "client disconnected")
+            return False
+
+def job_expired(job):
+    metrics.REJECTED.inc("expired")
+    return HTTPException(status_code=503, detail=job.error, headers={"Retry-After": str(jobs.retry_after())})
+
+def cache_result(result, image_digest):
+    """Mark a fresh result as a cache miss, record its metrics and store it if it succeeded"""
+    result.setdefault("debug_info", {})["cache"] = "miss"
+    metrics.observe_result(result)
+    
+    # Rule-only fallbacks (Ollama down) would outlive the outage by AI_CACHE_TTL
+    degraded = result["debug_info"].get("method", "").endswith("_rules_fallback")
+    # Key is computed after analysis so it carries the model that was actually used
+    if result.get("success") and not degraded:
+        cache.put(ResultCache.make_key(image_digest, analyzer.cache_config()), result)
+    return result
+
+async def lookup_cache(image_digest):
+    """Cached result marked as a hit, or None"""
+    # The disk tier is file I/O; keep it off the event loop
+    cached = await run_in_threadpool(cache.get, ResultCache.make_key(image_digest, analyzer.cache_config()))
+    if cached is not None:
+        cached.setdefault("debug_info", {})["cache"] = "hit"
+    return cached
+
+def trace_header(x_trace, x_trace_token):
+    """X-Trace if this client may ask for traces, else None"""
+    if not x_trace:
+        return None
+    if not TRACE_TOKEN or not hmac.compare_digest((x_trace_token or "").encode(), TRACE_TOKEN.encode()):
+        print("⚠️  Ignoring X-Trace without a valid X-Trace-Token", file=sys.stderr)
+        return None
+    return x_trace
+
+def trace_options(x_trace):
+    """analyze() tracing kwargs for this request ({} when not traced)"""
+    if not tracing.should_trace(x_trace, TRACE_SAMPLE_RATE):
+        return {}
+    profile = (x_trace or "").lower() == "profile" or (not x_trace and TRACE_PROFILE_SAMPLED)
+    return {"tracing": True, "profile": profile}
+
+def export_trace(result, filename, queued_at):
+    """Move spans/profile out of debug_info into trace files; returns the trace path or None"""
+    debug_info = result.get("debug_info", {})
+    spans = debug_info.pop("spans", None)
+    profile = debug_info.pop("profile", None)
+    if spans is None:
+        return None
+    
+    # Time between upload and a worker picking the job up
+    started = min((span["ts"] for span in spans), default=int(queued_at * 1e6)) / 1e6
+    spans.append(tracing.make_span("queue_wait", queued_at, started))
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{hashlib.sha256(f'{filename}{queued_at}'.encode()).hexdigest()[:8]}"
+    try:
+        path = tracing.write_trace(TRACE_DIR, name, spans, profile, {
+            "filename": filename,
+            "method": debug_info.get("method"),
+            "timings": debug_info.get("timings")
+        })
+    except Exception as e:
+        print(f"⚠️  Could not write trace: {e}", file=sys.stderr)
+        return None
+    print(f"🔬 Trace written: {path}", file=sys.stderr)
+    tracing.prune_traces(TRACE_DIR, TRACE_MAX_FILES)
+    return path
+
+def finish_result(result, filename, image_digest, queued_at):
+    """Export any trace, then cache the result (trace files are per request, not cached)"""
+    trace_path = export_trace(result, filename, queued_at)
+    result = cache_result(result, image_digest)
+    if trace_path:
+        result["debug_info"]["trace_file"] = trace_path
+    return result
+
+def run_analysis(content, filename, image_digest, options=None, queued_at=None):
+    """Blocking analysis, executed on the job executor"""
+    print(f"📸 Analyzing: {filename}", file=sys.stderr)
+    options = options or {}
+    
+    # Analyze (models already loaded!) - decoded straight from the upload bytes
+    if pool:
+        result = pool.analyze(content, **options)
+    else:
+        result = analyzer.analyze(content, **options)
+    result = finish_result(result, filename, image_digest, queued_at or time.time())
+    
+    print(f"✅ Analysis complete: {filename}", file=sys.stderr)
+    return result
+
+def run_stream(content, filename, image_digest, llm_timeout, emit, options=None, queued_at=None):
+    """Blocking analysis that emit()s progress events, then the result, then None"""
+    ocr = {}
+    options = options or {}
+    
+    def on_event(event):
+        if event["event"] == "ocr_result":
+            ocr["text"] = event["text"]
+        emit(event)
+    
+    try:
+        print(f"📸 Analyzing (streaming): {filename}", file=sys.stderr)
+        if pool:
+            # Progress callbacks can't cross the process boundary; only the result is streamed
+            result = pool.analyze(content, llm_timeout=llm_timeout, **options)
+        else:
+            result = analyzer.analyze(content, on_event=on_event, llm_timeout=llm_timeout, **options)
+        result = finish_result(result, filename, image_digest, queued_at or time.time())
+        if "text" in ocr:
+            result = dict(result, raw_ocr_text=ocr["text"])
+        emit({"event": "result", **result})
+    except Exception as e:
+        print(f"❌ Analysis error: {e}", file=sys.stderr)
+        emit({"event": "error", "error": f"Analysis failed: {e}"})
+    finally:
+        emit(None)
+
+def pool_batch(images, cancel=None):
+    """Spread a batch across the worker pool, yielding (index, result) as they finish"""
+    from concurrent.futures import as_completed
+    futures = {pool.submit(content, cancel=cancel): index for index, content in enumerate(images)}
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"success": False, "error": f"Analysis failed: {e}"}
+        yield futures[future], result
+
+def run_batch(entries, batch_size, emit, cancel=None):
+    """Blocking batch analysis; emit() is called once per image, then with None"""
+    sent = set()
+    try:
+        images = [entry["content"] for entry in entries]
+        if pool:
+            completed = pool_batch(images, cancel)
+        else:
+            completed = analyzer.analyze_batch(images, batch_size=batch_size, cancel=cancel)
+        for i, result in completed:
+            entry = entries[i]
+            emit({"index": entry["index"], "filename": entry["filename"], "result": cache_result(result, entry["digest"])})
+            sent.add(i)
+    except Exception as e:
+        print(f"❌ Batch analysis error: {e}", file=sys.stderr)
+        for i, entry in enumerate(entries):
+            if i not in sent:
+                emit({"index": entry["index"], "filename": entry["filename"],
+                      "result": {"success": False, "error": f"Analysis failed: {e}"}})
+    finally:
+        emit(None)
+    return {"count": len(entries)}
+
+def job_accepted(job):
+    """202 response pointing the client at the job status URL"""
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}"
+        }
+    )
+
 @app.post("/analyze")
-async def analyze_banner(file: UploadFile = File(...)):
+async def analyze_banner(
+    request: Request,
+    file: UploadFile = File(...),
+    wait: float = Query(0, ge=0, le=600, description="Seconds to wait for the result before returning the job id"),
+    deadline: Optional[float] = Query(None, gt=0, le=3600, description="Seconds the analysis may wait in the queue (default AI_REQUEST_DEADLINE)"),
+    x_trace: Optional[str] = Header(None, description="'1' to write a Chrome trace, 'profile' to add a stack profile"),
+    x_trace_token: Optional[str] = Header(None, description="Must match AI_TRACE_TOKEN for X-Trace to be honoured")
+):
     """
     Analyze banner image and extract event details
     
-    Returns JSON with event data or error
+    Queues the analysis and returns a job id (202). With ?wait=N the
+    request blocks up to N seconds and returns the result directly if
+    the job finishes in time. Traced requests (X-Trace header) skip the cache.
+    Overload is answered early: 429 when the queue is full, 503 when the
+    job could not start before its deadline, both with Retry-After.
+    A client that disconnects while waiting cancels the analysis.
     """
     if analyzer is None:
         raise HTTPException(status_code=503, detail="Analyzer not initialized")
@@ -70,34 +603,197 @@ async def analyze_banner(file: UploadFile = File(...)):
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Save uploaded file temporarily
-    tmp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        print(f"📸 Analyzing: {file.filename}", file=sys.stderr)
-        
-        # Analyze (models already loaded!)
-        result = analyzer.analyze(tmp_path)
-        
-        print(f"✅ Analysis complete: {file.filename}", file=sys.stderr)
-        
-        return JSONResponse(content=result)
-        
-    except Exception as e:
-        print(f"❌ Analysis error: {str(e)}", file=sys.stderr)
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    queued_at = time.time()
+    content = await read_upload(file)
+    image_digest = hashlib.sha256(content).hexdigest()
+    
+    x_trace = trace_header(x_trace, x_trace_token)
+    cached = None if x_trace else await lookup_cache(image_digest)
+    if cached is not None:
+        print(f"⚡ Cache hit: {file.filename}", file=sys.stderr)
+        return JSONResponse(content=cached)
+    
+    check_dimensions(content)
+    cancel = threading.Event()
+    job = submit_job(run_analysis, content, file.filename, image_digest, dict(trace_options(x_trace), cancel=cancel), queued_at,
+                     filename=file.filename, deadline=request_deadline(queued_at, deadline), cancel=cancel)
+    
+    if wait <= 0:
+        return job_accepted(job)
+    
+    # A timeout leaves the job running for later polling
+    if not await wait_for_job(job, wait, request):
+        return job_accepted(job)
+    
+    if job.status == "expired":
+        raise job_expired(job)
+    if job.status == "failed":
+        print(f"❌ Analysis error: {job.error}", file=sys.stderr)
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {job.error}")
+    
+    return JSONResponse(content=job.result)
+
+@app.post("/analyze/stream")
+async def analyze_banner_stream(
+    file: UploadFile = File(...),
+    llm_timeout: Optional[float] = Query(None, gt=0, description="Seconds after which LLM generation is cut off"),
+    deadline: Optional[float] = Query(None, gt=0, le=3600, description="Seconds the analysis may wait in the queue (default AI_REQUEST_DEADLINE)"),
+    x_trace: Optional[str] = Header(None, description="'1' to write a Chrome trace, 'profile' to add a stack profile"),
+    x_trace_token: Optional[str] = Header(None, description="Must match AI_TRACE_TOKEN for X-Trace to be honoured")
+):
+    """
+    Analyze a banner, streaming progress as NDJSON
+    
+    Events: queued, decoded, ocr_strategy (per strategy), ocr_best,
+    ocr_result (extracted text), llm_token (as Ollama generates), and
+    finally result (same body as /analyze) or error. Closing the stream
+    cancels the analysis.
+    """
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="Analyzer not initialized")
+    
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    queued_at = time.time()
+    content = await read_upload(file)
+    image_digest = hashlib.sha256(content).hexdigest()
+    
+    x_trace = trace_header(x_trace, x_trace_token)
+    cached = None if x_trace else await lookup_cache(image_digest)
+    if cached is not None:
+        print(f"⚡ Cache hit: {file.filename}", file=sys.stderr)
         
-    finally:
-        # Cleanup temp file
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.unlink(tmp_path)
-            except Exception as e:
-                print(f"⚠️  Failed to delete temp file: {e}", file=sys.stderr)
+        async def cached_stream():
+            yield json.dumps({"event": "result", **cached}) + "\n"
+        return StreamingResponse(cached_stream(), media_type="application/x-ndjson")
+    
+    check_dimensions(content)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    def on_expired():
+        metrics.REJECTED.inc("expired")
+        emit({"event": "error", "error": "Deadline passed before analysis started", "retry_after": jobs.retry_after()})
+        emit(None)
+    
+    cancel = threading.Event()
+    job = submit_job(run_stream, content, file.filename, image_digest, llm_timeout, emit,
+                     dict(trace_options(x_trace), cancel=cancel), queued_at,
+                     filename=file.filename, deadline=request_deadline(queued_at, deadline), on_expired=on_expired,
+                     cancel=cancel)
+    
+    async def stream():
+        complete = False
+        try:
+            yield json.dumps({"event": "queued", "job_id": job.id}) + "\n"
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield json.dumps(event) + "\n"
+            complete = True
+        finally:
+            # Starlette cancels this generator when the client disconnects
+            if not complete:
+                cancel_job(job, "stream closed")
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    batch_size: int = Query(16, ge=1, le=128, description="Text crops per recognizer forward pass")
+):
+    """
+    Analyze many banners in one request
+    
+    Streams NDJSON: one {"index", "filename", "result"} line per image in
+    completion order (cache hits and oversized images first), then a final
+    {"done": true} line. Closing the stream cancels the images not yet done.
+    """
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="Analyzer not initialized")
+    
+    for file in files:
+        if not file.content_type or not file.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File must be an image: {file.filename}")
+    
+    start = time.time()
+    immediate = []  # Cache hits and oversized images, sent before anything is analyzed
+    entries = []
+    for index, file in enumerate(files):
+        content = await read_upload(file)
+        image_digest = hashlib.sha256(content).hexdigest()
+        cached = await lookup_cache(image_digest)
+        if cached is not None:
+            immediate.append({"index": index, "filename": file.filename, "result": cached})
+            continue
+        error = dimension_error(content)
+        if error:
+            immediate.append({"index": index, "filename": file.filename, "result": {"success": False, "error": error}})
+            continue
+        entries.append({"index": index, "filename": file.filename, "digest": image_digest, "content": content})
+    
+    print(f"📚 Batch: {len(files)} images, {len(files) - len(entries)} answered without analysis", file=sys.stderr)
+    
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+    
+    def emit(item):
+        loop.call_soon_threadsafe(results.put_nowait, item)
+    
+    def on_expired():
+        metrics.REJECTED.inc("expired")
+        for entry in entries:
+            emit({"index": entry["index"], "filename": entry["filename"],
+                  "result": {"success": False, "error": "Deadline passed before analysis started"}})
+        emit(None)
+    
+    job = None
+    if entries:
+        cancel = threading.Event()
+        job = submit_job(run_batch, entries, batch_size, emit, cancel,
+                         filename=f"batch of {len(entries)}", deadline=request_deadline(start), on_expired=on_expired,
+                         cancel=cancel)
+    
+    async def stream():
+        complete = False
+        try:
+            for item in immediate:
+                yield json.dumps(item) + "\n"
+            while entries:
+                item = await results.get()
+                if item is None:
+                    break
+                yield json.dumps(item) + "\n"
+            complete = True
+            yield json.dumps({"done": True, "count": len(files), "elapsed": round(time.time() - start, 2)}) + "\n"
+        finally:
+            if job is not None and not complete:
+                cancel_job(job, "stream closed")
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll an analysis job for its status and result"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel an analysis job the client no longer wants"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    cancel_job(job, "cancelled by client")
+    return job.to_dict()
 
 if __name__ == "__main__":
     print("\n🌟 Banner Analyzer FastAPI Server", file=sys.stderr)
@@ -1,18 +1,36 @@
 import sys
+import io
 import json
+import hashlib
 import os
 from datetime import datetime
 import re
+import threading
+from functools import lru_cache
+from importlib.util import find_spec
 import time  # Added for timing
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
-import torch
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+from strategy_scheduler import StrategyScheduler
+from llm_client import OllamaClient, OLLAMA_AVAILABLE
+from llm_router import create_client
+import llm_prompt
+from llm_prompt import LLM_FIELDS
+import rule_extractor
+from tracing import make_span, StackSampler
+import onnx_ocr
+from image_io import ImageTooLarge, decode_image, image_dimensions, read_bytes
+from tiling import MAX_NATIVE_SIZE, tile_grid, offset_results, merge_tiles
 
 # Import OpenCV for advanced preprocessing
 try:
     import cv2
+    from preprocessing import PreprocessPipeline, VARIANT_BUILDERS
+    from phash_index import PHashIndex
+    from text_regions import estimate_layout
     CV2_AVAILABLE = True
 except ImportError:
+    PreprocessPipeline = VARIANT_BUILDERS = PHashIndex = estimate_layout = None
     CV2_AVAILABLE = False
     print("Warning: opencv-python not available - advanced preprocessing disabled", file=sys.stderr)
 
@@ -22,128 +40,362 @@ except ImportError:
 sys.stdout.reconfigure(encoding='utf-8')
 sys.stderr.reconfigure(encoding='utf-8')
 
-# Import EasyOCR
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
+# OCR backends (and torch under them) cost seconds and hundreds of MB to import,
+# so only check they're installed here; load_easyocr/load_paddleocr import the
+# selected one when its models are loaded
+EASYOCR_AVAILABLE = find_spec("easyocr") is not None
+if not EASYOCR_AVAILABLE:
     print("Warning: easyocr not available", file=sys.stderr)
 
-# Import PaddleOCR
-try:
-    from paddleocr import PaddleOCR
-    PADDLEOCR_AVAILABLE = True
-except ImportError:
-    PADDLEOCR_AVAILABLE = False
+PADDLEOCR_AVAILABLE = find_spec("paddleocr") is not None
+if not PADDLEOCR_AVAILABLE:
     print("Warning: paddleocr not available", file=sys.stderr)
 
+
+@lru_cache(maxsize=None)
+def cuda_available():
+    """Whether torch sees a GPU (imports torch on the first call)"""
+    if find_spec("torch") is None:
+        return False
+    import torch
+    return torch.cuda.is_available()
+
+class Cancelled(Exception):
+    """Raised at a checkpoint once the caller has given up on an analysis"""
+
+    def __init__(self, stage):
+        super().__init__(f"Analysis cancelled during {stage}")
+        self.stage = stage
+
+
+def check_cancelled(cancel, stage):
+    """Raise Cancelled if cancel (anything with is_set(), e.g. a threading.Event) is set"""
+    if cancel is not None and cancel.is_set():
+        raise Cancelled(stage)
+
+# Bump whenever the structuring prompt changes so cached results are invalidated
+PROMPT_VERSION = "3"
+
+
 class BannerAnalyzer:
-    def __init__(self, ocr_backend='easy'):
+    def __init__(self, ocr_backend='easy', scheduler=None, ocr_mode='two_stage', llm=None,
+                 rules_min_completeness=1.0, phash_index=None, adaptive_canvas=True,
+                 tile_threshold=3072, tile_workers=2, onnx=None, structuring=None):
         """Initialize analyzer
         
         Args:
-            ocr_backend: 'easy' or 'paddle' (default: 'easy')
+            ocr_backend: 'easy', 'onnx' (EasyOCR with its networks run by
+                      ONNX Runtime) or 'paddle' (default: 'easy')
+            ocr_mode: 'two_stage' detects text boxes once and only re-runs the
+                      recognizer per strategy; 'full' runs readtext per strategy
+            llm: OllamaClient (or LLMRouter) used for structuring (default: created on first use)
+            scheduler: StrategyScheduler controlling strategy order and early exit
+                       (default: in-memory scheduler with default thresholds)
+            rules_min_completeness: Share of core fields (title, date, time, venue)
+                       the rule extractor must fill to skip the LLM (above 1 = never skip)
+            phash_index: PHashIndex of earlier results; near-duplicate banners
+                       whose OCR text matches are answered from it without
+                       the rules/LLM (default: disabled)
+            adaptive_canvas: Crop OCR to the text area and size EasyOCR's canvas
+                       from the estimated character height instead of a fixed 2560
+            tile_threshold: Banners with a longer side than this (pixels) are OCRed
+                       as overlapping native-resolution tiles instead of being
+                       downscaled to 2048 (0 = never tile; EasyOCR only)
+            tile_workers: Tiles OCRed concurrently
+            onnx: Options for the 'onnx' backend: model_dir, quantized (prefer
+                  int8 graphs) and threads (ONNX Runtime intra-op threads)
+            structuring: LLM prompt options: mode ('schema': fixed system prompt,
+                  OCR text cut to ocr_tokens, JSON schema output capped at
+                  num_predict tokens; 'legacy': the original free-form prompt)
         """
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.reader = None  # EasyOCR
         self.reader_loaded = False
         self.paddle_ocr = None  # PaddleOCR
         self.paddle_loaded = False
+        self._load_lock = threading.Lock()  # Warm-up and an early request must not both load a model
         self.ocr_backend = ocr_backend
+        self.llm = llm
+        self.scheduler = scheduler or StrategyScheduler()
+        self.ocr_mode = ocr_mode
+        self.rules_min_completeness = rules_min_completeness
+        self.phash_index = phash_index
+        self.adaptive_canvas = adaptive_canvas
+        self.tile_threshold = tile_threshold
+        self.tile_workers = tile_workers
+        self.onnx = dict(onnx or {})
+        self.structuring = {
+            "mode": "schema",
+            "ocr_tokens": llm_prompt.OCR_TOKEN_BUDGET,
+            "num_predict": llm_prompt.NUM_PREDICT,
+            **(structuring or {})
+        }
+        
+    @classmethod
+    def from_config(cls, config):
+        """Build an analyzer from a plain (picklable) settings dict
+        
+        Keys: ocr_backend, ocr_mode, scheduler (StrategyScheduler kwargs),
+        llm (llm_router.create_client kwargs, or None to create the client on first use),
+        rules_min_completeness, phash (PHashIndex kwargs, or None to disable),
+        adaptive_canvas, tile_threshold, tile_workers, onnx and structuring.
+        """
+        llm = None
+        if config.get("llm") is not None and OLLAMA_AVAILABLE:
+            llm = create_client(**config["llm"])
+        phash_index = None
+        if config.get("phash") is not None and CV2_AVAILABLE:
+            phash_index = PHashIndex(**config["phash"])
+        return cls(
+            ocr_backend=config.get("ocr_backend", "easy"),
+            scheduler=StrategyScheduler(**config.get("scheduler", {})),
+            ocr_mode=config.get("ocr_mode", "two_stage"),
+            llm=llm,
+            rules_min_completeness=config.get("rules_min_completeness", 1.0),
+            phash_index=phash_index,
+            adaptive_canvas=config.get("adaptive_canvas", True),
+            tile_threshold=config.get("tile_threshold", 3072),
+            tile_workers=config.get("tile_workers", 2),
+            onnx=config.get("onnx"),
+            structuring=config.get("structuring")
+        )
+    
+    def load_models(self):
+        """Load the OCR models for the selected backend now instead of on first use"""
+        if self.ocr_backend == 'paddle':
+            if PADDLEOCR_AVAILABLE:
+                self.load_paddleocr()
+        elif EASYOCR_AVAILABLE:
+            self.load_easyocr()
+    
+    @property
+    def device(self):
+        """'cuda' or 'cpu' for the OCR models"""
+        return "cuda" if cuda_available() else "cpu"
+    
+    @property
+    def ollama_model(self):
+        """Model the LLM client resolved (None until Ollama has been reached)"""
+        return self.llm.model if self.llm else None
+    
+    def cache_config(self):
+        """Settings that change the analysis output (used in result cache keys)"""
+        return {
+            "ocr_backend": self.ocr_backend,
+            "ocr_mode": self.ocr_mode,
+            # Early exit and the time budget decide which OCR pass's text is kept
+            "scheduler": {
+                "min_confidence": self.scheduler.min_confidence,
+                "min_chars": self.scheduler.min_chars,
+                "time_budget": self.scheduler.time_budget
+            },
+            "ollama_model": self.ollama_model,
+            "prompt_version": PROMPT_VERSION,
+            "structuring": self.structuring,
+            "rules_min_completeness": self.rules_min_completeness,
+            "adaptive_canvas": self.adaptive_canvas,
+            "tile_threshold": self.tile_threshold,
+            "onnx_quantized": self.onnx.get("quantized", True) if self.ocr_backend == 'onnx' else None
+        }
+    
+    @staticmethod
+    def new_trace(spans=False):
+        """Per-request dict the stages record into; ends up in debug_info
+        
+        With spans=True every stage also appends a Chrome trace event to trace["spans"].
+        """
+        trace = {"timings": {}, "ocr": {}}
+        if spans:
+            trace["spans"] = []
+        return trace
+    
+    @staticmethod
+    def _span(trace, name, start, **args):
+        """Add a trace span from start (time.time()) until now, when tracing is on"""
+        if trace is not None and "spans" in trace:
+            trace["spans"].append(make_span(name, start, **args))
+    
+    @staticmethod
+    def _record(trace, stage, seconds, strategy=None):
+        """Add a stage duration to trace (no-op without one)"""
+        if trace is None:
+            return
+        timings = trace["timings"]
+        if strategy is None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        else:
+            timings.setdefault(stage, {})[strategy] = seconds
+    
+    def find_duplicate(self, image, on_event=None, trace=None):
+        """Look the banner up in the perceptual hash index before any OCR
+        
+        Returns (candidates, decoded image, hash). Candidates are confirmed by
+        confirm_duplicate: near-identical ones straight away, the rest against
+        this banner's OCR text. The decoded image is handed on to OCR so the
+        banner is only decoded once.
+        """
+        if self.phash_index is None:
+            return [], image, None
+        start = time.time()
+        img = decode_image(image, max_size=2048)
+        self._record(trace, "decode", time.time() - start)
+        if img is None:
+            return [], image, None
+        self._span(trace, "decode", start, width=img.shape[1], height=img.shape[0])
+        start = time.time()
+        value = self.phash_index.hash(img)
+        config_key = hashlib.sha256(json.dumps(self.cache_config(), sort_keys=True).encode()).hexdigest()[:16]
+        candidates = self.phash_index.find(value, config_key)
+        self._record(trace, "phash", time.time() - start)
+        self._span(trace, "phash_lookup", start, candidates=len(candidates))
+        # Tiled OCR needs the full-resolution original, not the 2048px decode
+        return candidates, image if self.needs_tiling(image) else img, (value, config_key)
+    
+    def confirm_duplicate(self, candidates, ocr_text=None, on_event=None):
+        """Stored event_data of a hash candidate whose OCR text matches this banner's, or None
+        
+        Without ocr_text (before OCR) only a near-identical hash counts, saving
+        OCR as well. Otherwise it saves the rules and LLM; a banner from the
+        same template with another date, time or venue reads differently and
+        is analyzed normally.
+        """
+        if not candidates:
+            return None
+        match = self.phash_index.confirm(candidates, ocr_text)
+        if match is None:
+            if ocr_text is not None:
+                print(f"🖼️  {len(candidates)} perceptual hash candidate(s) read differently, analyzing", file=sys.stderr)
+            return None
+        event_data, distance = match
+        if ocr_text is None:
+            print(f"🖼️  Duplicate of an analyzed banner (distance {distance}), skipping OCR and Llama", file=sys.stderr)
+        else:
+            print(f"🖼️  Duplicate of an analyzed banner (distance {distance}, same text), skipping Llama", file=sys.stderr)
+        if on_event:
+            on_event({"event": "duplicate", "distance": distance})
+        return event_data
+    
+    def remember(self, image_hash, event_data, method, ocr_text):
+        """Add a fresh result (and the OCR text that confirms later copies) to the perceptual hash index"""
+        # Rule-only fallbacks (Ollama down) shouldn't answer future copies of the banner
+        if image_hash is None or not event_data or method in ("rules_fallback", "phash"):
+            return
+        self.phash_index.add(image_hash[0], image_hash[1], event_data, ocr_text)
         
     def load_easyocr(self):
         """Load EasyOCR reader only when needed"""
         if self.reader_loaded:
             return
-            
-        print("🚀 Loading EasyOCR model (this may take a moment)...", file=sys.stderr)
-        # Initialize reader - this downloads models if needed
-        # gpu=True if CUDA is available, else False
-        use_gpu = torch.cuda.is_available()
-        # verbose=False prevents progress bars from crashing on Windows terminals with encoding issues
-        self.reader = easyocr.Reader(['en'], gpu=use_gpu, verbose=False)
-        self.reader_loaded = True
-        print(f"✅ EasyOCR loaded! (GPU: {use_gpu})", file=sys.stderr)
+        
+        with self._load_lock:
+            if self.reader_loaded:
+                return
+            print("🚀 Loading EasyOCR model (this may take a moment)...", file=sys.stderr)
+            import easyocr
+            onnx_models = self._onnx_models() if self.ocr_backend == 'onnx' else None
+            # Initialize reader - this downloads models if needed
+            # gpu=True if CUDA is available, else False
+            use_gpu = cuda_available() and onnx_models is None
+            # verbose=False prevents progress bars from crashing on Windows terminals with encoding issues
+            # (torch's own int8 conversion is skipped when ONNX Runtime replaces the networks)
+            self.reader = easyocr.Reader(['en'], gpu=use_gpu, verbose=False, quantize=onnx_models is None)
+            if onnx_models:
+                onnx_ocr.attach(self.reader, *onnx_models, threads=self.onnx.get("threads", 0))
+            self.reader_loaded = True
+            print(f"✅ EasyOCR loaded! (GPU: {use_gpu}, ONNX Runtime: {onnx_models is not None})", file=sys.stderr)
+    
+    def _onnx_models(self):
+        """Exported (detector, recognizer) graphs for the 'onnx' backend, or None to use PyTorch"""
+        if not onnx_ocr.ONNXRUNTIME_AVAILABLE:
+            print("⚠️  onnxruntime not installed, using PyTorch EasyOCR", file=sys.stderr)
+            return None
+        model_dir = self.onnx.get("model_dir") or onnx_ocr.MODEL_DIR
+        models = onnx_ocr.find_models(model_dir, self.onnx.get("quantized", True))
+        if models is None:
+            print(f"⚠️  No ONNX graphs in {model_dir} (run: python onnx_export.py export), using PyTorch EasyOCR", file=sys.stderr)
+        return models
     
     def load_paddleocr(self):
         """Load PaddleOCR reader only when needed"""
         if self.paddle_loaded:
             return
-            
-        print("🚀 Loading PaddleOCR model...", file=sys.stderr)
-        # Initialize PaddleOCR with minimal settings for faster loading
-        self.paddle_ocr = PaddleOCR(
-            use_textline_orientation=True,
-            lang='en'
-        )
-        self.paddle_loaded = True
-        print(f"✅ PaddleOCR loaded!", file=sys.stderr)
+        
+        with self._load_lock:
+            if self.paddle_loaded:
+                return
+            print("🚀 Loading PaddleOCR model...", file=sys.stderr)
+            from paddleocr import PaddleOCR
+            # Initialize PaddleOCR with minimal settings for faster loading
+            self.paddle_ocr = PaddleOCR(
+                use_textline_orientation=True,
+                lang='en'
+            )
+            self.paddle_loaded = True
+            print(f"✅ PaddleOCR loaded!", file=sys.stderr)
+    
+    @staticmethod
+    def _warm_up_banner():
+        """Small synthetic banner (RGB array) with a few lines of dark text on white"""
+        image = Image.new('RGB', (320, 96), 'white')
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(("TECH FEST 2025", "Date: 28 December 2025", "Venue: Main Hall")):
+            draw.text((8, 8 + i * 28), line, fill='black')
+        # The default bitmap font is tiny; scale up to typical banner text height
+        return np.array(image.resize((960, 288), Image.Resampling.NEAREST))
+    
+    def warm_up(self):
+        """Load the OCR models and run one inference on a synthetic banner
+        
+        Pays for model loading and the detector/recognizer's first-call setup
+        before any real request does. Returns the seconds it took.
+        """
+        start = time.time()
+        self.load_models()
+        image = self._warm_up_banner()
+        if self.ocr_backend == 'paddle':
+            if self.paddle_loaded:
+                self.paddle_ocr.ocr(image)
+        elif self.reader_loaded:
+            self._ocr_pass(image)
+        seconds = time.time() - start
+        print(f"🔥 OCR warmed up in {seconds:.1f}s", file=sys.stderr)
+        return seconds
 
-    def preprocess_image_advanced(self, image_path):
-        """Advanced multi-strategy preprocessing for optimal OCR"""
+    def preprocess_image_advanced(self, image):
+        """Advanced multi-strategy preprocessing for optimal OCR
+        
+        Args:
+            image: File path, encoded image bytes, or BGR/grayscale numpy array
+        
+        Returns a lazy mapping of strategy name -> image. Each variant is only
+        computed when it is looked up, and iteration yields the cheapest first.
+        """
         if not CV2_AVAILABLE:
             # Fallback to basic PIL preprocessing
-            return self._preprocess_basic_pil(image_path)
+            return self._preprocess_basic_pil(image)
         
         try:
-            # Read image with OpenCV
-            img = cv2.imread(image_path)
+            # Decode straight from memory, at reduced scale for large images
+            img = decode_image(image, max_size=2048)
             if img is None:
                 print(f"⚠️  Could not read image with OpenCV, using PIL fallback", file=sys.stderr)
-                return self._preprocess_basic_pil(image_path)
-            
-            # Resize if too large (to avoid OOM and speed up processing)
-            max_size = 2048
-            height, width = img.shape[:2]
-            if max(height, width) > max_size:
-                scale = max_size / max(height, width)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-                img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Create multiple preprocessing variants
-            variants = {}
-            
-            # Strategy 1: High Contrast (good for low-contrast text)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-            variants['high_contrast'] = clahe.apply(gray)
-            
-            # Strategy 2: Adaptive Threshold (good for varied backgrounds)
-            adaptive = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            variants['adaptive_thresh'] = adaptive
-            
-            # Strategy 3: Denoised + Sharpened (good for noisy images)
-            denoised = cv2.fastNlMeansDenoising(gray)
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            sharpened = cv2.filter2D(denoised, -1, kernel)
-            variants['denoised_sharp'] = sharpened
-            
-            # Strategy 4: Simple Bilateral Filter (preserves edges, reduces noise)
-            bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
-            variants['bilateral'] = bilateral
-            
-            # Strategy 5: Original enhanced (baseline)
-            _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            variants['original_otsu'] = otsu
+                return self._preprocess_basic_pil(image)
             
-            return variants
+            return PreprocessPipeline(img, max_size=2048)
                 
         except Exception as e:
             print(f"⚠️  Advanced preprocessing failed: {str(e)}", file=sys.stderr)
             print(f"   Falling back to basic PIL preprocessing", file=sys.stderr)
-            return self._preprocess_basic_pil(image_path)
+            return self._preprocess_basic_pil(image)
     
-    def _preprocess_basic_pil(self, image_path):
+    def _preprocess_basic_pil(self, image):
         """Basic PIL preprocessing as fallback"""
         try:
-            image = Image.open(image_path)
+            max_size = 2048
+            if isinstance(image, np.ndarray):
+                image = Image.fromarray(image)
+            else:
+                image = Image.open(io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image)
+                image.draft('L', (max_size, max_size))  # JPEG: decode at reduced scale
             
             # Convert to grayscale
             image = image.convert('L')
@@ -153,7 +405,6 @@ class BannerAnalyzer:
             image = enhancer.enhance(1.5)
             
             # Resize if needed
-            max_size = 2048
             if max(image.size) > max_size:
                 ratio = max_size / max(image.size)
                 new_size = (int(image.size[0] * ratio), int(image.size[1] * ratio))
@@ -191,8 +442,141 @@ class BannerAnalyzer:
         
         return '\n'.join(cleaned_lines)
         
-    def extract_text_ocr(self, image_path):
-        """Extract text using EasyOCR with multi-strategy preprocessing"""
+    # Variant used for the single detection pass in two-stage mode
+    DETECTION_STRATEGY = 'high_contrast'
+    
+    def detect_text_regions(self, image, plan=None):
+        """Run the CRAFT detector once and return (horizontal_list, free_list)
+        
+        plan (a text_regions.LayoutPlan) sets the detector's canvas_size and mag_ratio.
+        """
+        horizontal_list, free_list = self.reader.detect(
+            image,
+            min_size=10,
+            text_threshold=0.7,
+            low_text=0.4,
+            link_threshold=0.4,
+            canvas_size=plan.canvas_size if plan else 2560,
+            mag_ratio=plan.mag_ratio if plan else 1.0
+        )
+        return horizontal_list[0], free_list[0]
+    
+    def _ocr_pass(self, image, regions=None, batch_size=1, plan=None):
+        """One EasyOCR pass over a file path or numpy array
+        
+        With regions from detect_text_regions only the recognizer runs.
+        batch_size is how many text crops the recognizer processes at once.
+        plan sizes the detector when readtext has to detect as well.
+        """
+        if regions is not None:
+            horizontal_list, free_list = regions
+            return self.reader.recognize(
+                image,
+                horizontal_list=horizontal_list,
+                free_list=free_list,
+                detail=1,
+                paragraph=False,
+                batch_size=batch_size
+            )
+        
+        # Run EasyOCR with optimized parameters
+        return self.reader.readtext(
+            image,
+            detail=1,
+            paragraph=False,
+            min_size=10,
+            text_threshold=0.7,
+            low_text=0.4,
+            link_threshold=0.4,
+            canvas_size=plan.canvas_size if plan else 2560,
+            mag_ratio=plan.mag_ratio if plan else 1.0,
+            batch_size=batch_size
+        )
+        
+    def needs_tiling(self, image):
+        """True when image is big enough that the 2048px downscale would lose small text"""
+        if not self.tile_threshold or not CV2_AVAILABLE or self.ocr_backend == 'paddle':
+            return False
+        if isinstance(image, np.ndarray):
+            height, width = image.shape[:2]
+        else:
+            try:
+                dims = image_dimensions(read_bytes(image))
+            except ImageTooLarge:
+                return False  # decode_image refuses it
+            if dims is None:
+                return False
+            width, height = dims
+        return max(width, height) > self.tile_threshold
+    
+    def extract_text_tiled(self, image, batch_size=1, on_event=None, trace=None, cancel=None):
+        """OCR a large banner as overlapping native-resolution tiles, in parallel
+        
+        Every tile gets the historically best preprocessing strategy only; boxes
+        read twice across a seam are merged and the rest joined in reading order.
+        Returns (text, confidence) like extract_text_ocr.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        prepare_start = time.time()
+        img = decode_image(image, max_size=MAX_NATIVE_SIZE)
+        if img is None:
+            return "", 0.0
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        del img
+        height, width = gray.shape[:2]
+        if on_event:
+            on_event({"event": "decoded", "width": width, "height": height})
+        self._record(trace, "decode", time.time() - prepare_start)
+        self._span(trace, "prepare_grayscale", prepare_start, width=width, height=height, tiled=True)
+        
+        strategy = self.scheduler.order(VARIANT_BUILDERS)[0]
+        tiles = tile_grid(height, width)
+        print(f"🧩 Tiling {width}x{height} banner into {len(tiles)} tiles ({strategy})", file=sys.stderr)
+        
+        def ocr_tile(box):
+            check_cancelled(cancel, "ocr")
+            x0, y0, x1, y1 = box
+            start = time.time()
+            variant = VARIANT_BUILDERS[strategy](gray[y0:y1, x0:x1])
+            results = self._ocr_pass(variant, batch_size=batch_size)
+            self._span(trace, "ocr_tile", start, box=list(box), boxes=len(results))
+            return offset_results(results, x0, y0)
+        
+        ocr_start = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.tile_workers, len(tiles))), thread_name_prefix="ocr-tile") as pool:
+            tile_results = list(pool.map(ocr_tile, tiles))
+        self._record(trace, "ocr", time.time() - ocr_start, strategy)
+        
+        merge_start = time.time()
+        merged = merge_tiles(tile_results)
+        self._span(trace, "merge_tiles", merge_start, boxes=sum(len(r) for r in tile_results), kept=len(merged))
+        
+        kept = [(text, prob) for _, text, prob in merged if prob > 0.4]
+        if not kept:
+            return "", 0.0
+        cleaned_text = self.clean_ocr_text("\n".join(text for text, _ in kept))
+        confidence_pct = sum(prob for _, prob in kept) / len(kept) * 100
+        self.scheduler.observe_ocr_time((time.time() - ocr_start) / len(tiles))
+        if trace is not None:
+            trace["ocr"].update(strategy=strategy, tiles=len(tiles))
+        
+        print(f"✅ Tiled OCR: {len(kept)} text blocks from {len(tiles)} tiles (confidence: {confidence_pct:.1f}%)", file=sys.stderr)
+        if on_event:
+            on_event({"event": "ocr_best", "strategy": strategy, "confidence": round(confidence_pct, 1)})
+        return cleaned_text, confidence_pct
+    
+    def extract_text_ocr(self, image, time_budget=None, batch_size=1, on_event=None, trace=None, cancel=None):
+        """Extract text using EasyOCR with multi-strategy preprocessing
+        
+        Strategies run in order of historical win rate and stop as soon as one
+        passes the scheduler's confidence/length thresholds or the time budget
+        (seconds, defaults to scheduler.time_budget) runs out.
+        on_event, if given, receives a progress dict after decoding and per strategy.
+        trace (from new_trace) collects per-stage timings and the winning strategy.
+        Banners over tile_threshold go through extract_text_tiled instead.
+        cancel is checked before detection and between strategies (raises Cancelled).
+        """
         if not EASYOCR_AVAILABLE:
             print("OCR skipped: EasyOCR not installed", file=sys.stderr)
             return "", 0.0
@@ -200,49 +584,109 @@ class BannerAnalyzer:
         try:
             self.load_easyocr()
             
+            if self.needs_tiling(image):
+                text, confidence = self.extract_text_tiled(image, batch_size, on_event, trace, cancel)
+                if text:
+                    return text, confidence
+                print("⚠️  Tiled OCR found no text, retrying on the downscaled image", file=sys.stderr)
+            
             print(f"📸 Preprocessing image with multiple strategies...", file=sys.stderr)
-            preprocessed_variants = self.preprocess_image_advanced(image_path)
+            ocr_span_start = time.time()
+            prepare_start = time.time()
+            preprocessed_variants = self.preprocess_image_advanced(image)
             
             if not preprocessed_variants:
                 print("⚠️  Preprocessing failed, using original image", file=sys.stderr)
-                preprocessed_variants = {'original': image_path}
+                preprocessed_variants = {'original': image}
+            
+            height = width = None
+            if CV2_AVAILABLE and isinstance(preprocessed_variants, PreprocessPipeline):
+                height, width = preprocessed_variants.gray.shape[:2]
+                if on_event:
+                    on_event({"event": "decoded", "width": width, "height": height})
+            self._record(trace, "decode", time.time() - prepare_start)
+            self._span(trace, "prepare_grayscale", prepare_start, width=width, height=height)
+            
+            # Skip empty decoration and scale the detector to the text actually present
+            plan = None
+            if self.adaptive_canvas and CV2_AVAILABLE and isinstance(preprocessed_variants, PreprocessPipeline):
+                layout_start = time.time()
+                plan = estimate_layout(preprocessed_variants.gray)
+                preprocessed_variants.crop(plan.box)
+                self._record(trace, "layout", time.time() - layout_start)
+                self._span(trace, "estimate_layout", layout_start, **plan.to_dict())
+                if trace is not None:
+                    trace["ocr"]["layout"] = plan.to_dict()
+                print(f"  📐 Text layout: crop {plan.box or 'none'}, char height {plan.char_height}px → "
+                      f"canvas {plan.canvas_size}, mag {plan.mag_ratio}", file=sys.stderr)
             
             best_result = None
             best_confidence = 0
             best_strategy = None
+            tried = []
+            
+            if time_budget is None:
+                time_budget = self.scheduler.time_budget
+            ocr_start = time.time()
             
-            # Try each preprocessing strategy
-            for strategy_name, processed_img in preprocessed_variants.items():
+            # Two-stage: detect boxes once on the highest-contrast variant, then
+            # every strategy only pays for recognition on those crops
+            regions = None
+            detection_img = None
+            detection_strategy = None
+            check_cancelled(cancel, "ocr")
+            if self.ocr_mode == 'two_stage':
+                try:
+                    detection_strategy = self.DETECTION_STRATEGY if self.DETECTION_STRATEGY in preprocessed_variants else next(iter(preprocessed_variants))
+                    detect_start = time.time()
+                    detection_img = preprocessed_variants[detection_strategy]
+                    built = time.time()
+                    self._record(trace, "preprocess", built - detect_start, detection_strategy)
+                    self._span(trace, f"preprocess:{detection_strategy}", detect_start)
+                    regions = self.detect_text_regions(detection_img, plan)
+                    self._record(trace, "ocr_detect", time.time() - built)
+                    region_count = len(regions[0]) + len(regions[1])
+                    self._span(trace, "detect_text_regions", built, regions=region_count)
+                    print(f"  🔎 Detected {region_count} text regions on {detection_strategy} ({time.time() - detect_start:.2f}s)", file=sys.stderr)
+                    if region_count == 0:
+                        regions = None  # Let full readtext passes have a go
+                except Exception as detect_error:
+                    print(f"  ⚠️  Text detection failed, using full OCR passes: {detect_error}", file=sys.stderr)
+                    regions = None
+            
+            # Cheap variants first unless an expensive one wins much more often
+            costs = None
+            if CV2_AVAILABLE and isinstance(preprocessed_variants, PreprocessPipeline):
+                costs = {name: preprocessed_variants.cost(name) for name in preprocessed_variants}
+            
+            # Try preprocessing strategies, historically best first
+            for strategy_name in self.scheduler.order(preprocessed_variants.keys(), costs):
+                check_cancelled(cancel, "ocr")
+                if tried and time_budget is not None and time.time() - ocr_start > time_budget:
+                    print(f"  ⏱️  Time budget of {time_budget:.1f}s used up after {len(tried)} strategies", file=sys.stderr)
+                    break
+                
+                tried.append(strategy_name)
                 print(f"  Testing strategy: {strategy_name}...", file=sys.stderr)
+                strategy_start = time.time()
                 
                 try:
-                    # Run EasyOCR with optimized parameters
-                    if isinstance(processed_img, str):
-                        # It's a file path
-                        results = self.reader.readtext(
-                            processed_img,
-                            detail=1,
-                            paragraph=False,
-                            min_size=10,
-                            text_threshold=0.7,
-                            low_text=0.4,
-                            link_threshold=0.4,
-                            canvas_size=2560,
-                            mag_ratio=1.0
-                        )
+                    # Built on demand - strategies that are never tried are never computed
+                    if strategy_name == detection_strategy and detection_img is not None:
+                        processed_img = detection_img
                     else:
-                        # It's a numpy array
-                        results = self.reader.readtext(
-                            processed_img,
-                            detail=1,
-                            paragraph=False,
-                            min_size=10,
-                            text_threshold=0.7,
-                            low_text=0.4,
-                            link_threshold=0.4,
-                            canvas_size=2560,
-                            mag_ratio=1.0
-                        )
+                        build_start = time.time()
+                        processed_img = preprocessed_variants[strategy_name]
+                        self._record(trace, "preprocess", time.time() - build_start, strategy_name)
+                        self._span(trace, f"preprocess:{strategy_name}", build_start)
+                    pass_start = time.time()
+                    
+                    results = self._ocr_pass(processed_img, regions, batch_size, plan)
+                    
+                    pass_seconds = time.time() - pass_start
+                    self.scheduler.observe_ocr_time(pass_seconds)
+                    self._record(trace, "ocr", pass_seconds, strategy_name)
+                    self._span(trace, f"ocr_pass:{strategy_name}", pass_start, regions_reused=regions is not None)
                     
                     # Sort results by vertical position (top to bottom)
                     results_sorted = sorted(results, key=lambda x: x[0][0][1])
@@ -263,12 +707,22 @@ class BannerAnalyzer:
                     avg_conf = (total_conf / count_conf) if count_conf > 0 else 0.0
                     
                     print(f"    → Extracted {len(text_parts)} text blocks, confidence: {avg_conf*100:.1f}%", file=sys.stderr)
+                    if on_event:
+                        on_event({"event": "ocr_strategy", "strategy": strategy_name,
+                                  "blocks": len(text_parts), "confidence": round(avg_conf * 100, 1)})
+                    
+                    self._span(trace, f"strategy:{strategy_name}", strategy_start,
+                               blocks=len(text_parts), confidence=round(avg_conf * 100, 1))
                     
                     # Keep track of best result
                     if avg_conf > best_confidence:
                         best_confidence = avg_conf
                         best_result = full_text
                         best_strategy = strategy_name
+                    
+                    if self.scheduler.is_good_enough(avg_conf, full_text):
+                        print(f"  ⚡ Early exit: {strategy_name} passed thresholds", file=sys.stderr)
+                        break
                         
                 except Exception as strategy_error:
                     print(f"    ✗ Strategy {strategy_name} failed: {strategy_error}", file=sys.stderr)
@@ -279,21 +733,31 @@ class BannerAnalyzer:
                 cleaned_text = self.clean_ocr_text(best_result)
                 confidence_pct = best_confidence * 100
                 
-                print(f"✅ Best strategy: {best_strategy} (confidence: {confidence_pct:.1f}%)", file=sys.stderr)
+                # Feed the result back so the ordering keeps learning
+                self.scheduler.record(best_strategy, tried)
+                if trace is not None:
+                    trace["ocr"]["strategy"] = best_strategy
+                self._span(trace, "extract_text_ocr", ocr_span_start, best_strategy=best_strategy, tried=len(tried))
+                
+                print(f"✅ Best strategy: {best_strategy} (confidence: {confidence_pct:.1f}%, tried {len(tried)}/{len(preprocessed_variants)})", file=sys.stderr)
                 print(f"📝 Extracted {len(cleaned_text)} characters", file=sys.stderr)
+                if on_event:
+                    on_event({"event": "ocr_best", "strategy": best_strategy, "confidence": round(confidence_pct, 1)})
                 
                 return cleaned_text, confidence_pct
             else:
                 print("⚠️  All strategies failed", file=sys.stderr)
                 return "", 0.0
             
+        except Cancelled:
+            raise
         except Exception as e:
             print(f"OCR Error: {str(e)}", file=sys.stderr)
             import traceback
             traceback.print_exc(file=sys.stderr)
             return "", 0.0
     
-    def extract_text_paddle(self, image_path):
+    def extract_text_paddle(self, image):
         """Extract text using PaddleOCR"""
         if not PADDLEOCR_AVAILABLE:
             print("PaddleOCR skipped: not installed", file=sys.stderr)
@@ -303,7 +767,9 @@ class BannerAnalyzer:
             self.load_paddleocr()
             
             print(f"📸 Running PaddleOCR...", file=sys.stderr)
-            results = self.paddle_ocr.ocr(image_path)
+            if not isinstance(image, str) and CV2_AVAILABLE:
+                image = decode_image(image)
+            results = self.paddle_ocr.ocr(image)
             
             if not results or len(results) == 0:
                 return "", 0.0
@@ -386,93 +852,105 @@ class BannerAnalyzer:
         
         return event_data
 
-    def analyze_with_ollama(self, image_path):
-        """Analyze image using EasyOCR + Ollama text-LLM (hybrid approach)"""
-        try:
-            import ollama
-        except ImportError:
+    def check_ollama(self):
+        """True if the Ollama server is reachable and has a usable model"""
+        if not OLLAMA_AVAILABLE:
             print("⚠️ Ollama package not installed. Run: pip install ollama", file=sys.stderr)
+            return False
+        
+        if self.llm is None:
+            self.llm = OllamaClient()
+        
+        # Model discovery is cached by the client; this only hits Ollama when unresolved
+        return self.llm.ensure_model() is not None
+    
+    def extract_text(self, image, batch_size=1, on_event=None, trace=None, cancel=None):
+        """STEP 1: Use selected OCR backend to extract text
+        
+        Returns (ocr_text, ocr_conf), or None if too little text was found.
+        """
+        print(f"📝 Step 1: Extracting text with {self.ocr_backend.upper()}OCR...", file=sys.stderr)
+        start_time = time.time()
+        check_cancelled(cancel, "ocr")
+        if self.ocr_backend == 'paddle':
+            ocr_text, ocr_conf = self.extract_text_paddle(image)
+        else:
+            ocr_text, ocr_conf = self.extract_text_ocr(image, batch_size=batch_size, on_event=on_event, trace=trace, cancel=cancel)
+        ocr_time = time.time() - start_time
+        self._record(trace, "ocr_total", ocr_time)
+        if trace is not None:
+            trace["ocr"].update(confidence=round(ocr_conf, 1), chars=len(ocr_text or ""))
+        self._span(trace, "extract_text", start_time, backend=self.ocr_backend, chars=len(ocr_text or ""))
+        
+        if not ocr_text or len(ocr_text.strip()) < 10:
+            print(f"⚠️ {self.ocr_backend.upper()}OCR extracted very little text. Cannot proceed.", file=sys.stderr)
             return None
         
-        print(f"🧠 Analyzing with EasyOCR + Ollama hybrid approach...", file=sys.stderr)
+        print(f"✅ {self.ocr_backend.upper()}OCR extracted {len(ocr_text)} characters (confidence: {ocr_conf:.1f}%)", file=sys.stderr)
+        print(f"⏱️  OCR Time: {ocr_time:.2f}s", file=sys.stderr)
+        print(f"📄 OCR Text preview:\n{ocr_text[:300]}...\n", file=sys.stderr)
+        if on_event:
+            on_event({"event": "ocr_result", "text": ocr_text, "confidence": round(ocr_conf, 1)})
+        return ocr_text, ocr_conf
+    
+    def structure_with_ollama(self, ocr_text, on_event=None, llm_timeout=None, fields=None, cancel=None, trace=None):
+        """STEP 2: Use text-only Llama to structure the OCR text
         
-        try:
-            # Check if Ollama is running
-            try:
-                available_models = ollama.list()
-                print(f"✅ Ollama is running. Found {len(available_models.get('models', []))} models.", file=sys.stderr)
-            except Exception as conn_error:
-                print(f"⚠️ Cannot connect to Ollama. Is it running? Error: {conn_error}", file=sys.stderr)
-                return None
-            
-            # STEP 1: Use selected OCR backend to extract text
-            print(f"📝 Step 1: Extracting text with {self.ocr_backend.upper()}OCR...", file=sys.stderr)
-            start_time = time.time()
-            if self.ocr_backend == 'paddle':
-                ocr_text, ocr_conf = self.extract_text_paddle(image_path)
-            else:
-                ocr_text, ocr_conf = self.extract_text_ocr(image_path)
-            ocr_time = time.time() - start_time
-            
-            if not ocr_text or len(ocr_text.strip()) < 10:
-                print(f"⚠️ {self.ocr_backend.upper()}OCR extracted very little text. Cannot proceed.", file=sys.stderr)
-                return None
-            
-            print(f"✅ {self.ocr_backend.upper()}OCR extracted {len(ocr_text)} characters (confidence: {ocr_conf:.1f}%)", file=sys.stderr)
-            print(f"⏱️  OCR Time: {ocr_time:.2f}s", file=sys.stderr)
-            print(f"📄 OCR Text preview:\n{ocr_text[:300]}...\n", file=sys.stderr)
-            
-            # STEP 2: Use text-only Llama to structure the OCR text
-            print("🔍 Step 2: Structuring text with Llama...", file=sys.stderr)
-            llama_start = time.time()
-            
-            # Auto-detect available model - prefer text-only Llama, but can use LLaVA for structuring
-            models = available_models.get('models', [])
-            print(f"🔍 DEBUG: Found {len(models)} models in Ollama", file=sys.stderr)
-            if models:
-                print(f"🔍 DEBUG: First model structure: {models[0]}", file=sys.stderr)
-            
-            MODEL_NAME = None
-            
-            # Try to find models in order of preference
-            model_preferences = ["llama3.2", "llama3.1", "llama3", "llama2", "llava"]
-            for pref in model_preferences:
-                for model in models:
-                    # Handle both dict with 'name' key and object with 'model' attribute
-                    if isinstance(model, dict):
-                        model_name = model.get('name', model.get('model', ''))
-                    elif hasattr(model, 'model'):
-                        model_name = model.model  # Access attribute directly
-                    elif hasattr(model, 'name'):
-                        model_name = model.name
-                    else:
-                        model_name = str(model)
-                    
-                    if pref in model_name.lower():
-                        MODEL_NAME = model_name
-                        print(f"✅ Selected model: {MODEL_NAME} (matched preference: {pref})", file=sys.stderr)
-                        break
-                if MODEL_NAME:
-                    break
-            
-            # Fallback to first available model
-            if not MODEL_NAME and models:
-                first_model = models[0]
-                if isinstance(first_model, dict):
-                    MODEL_NAME = first_model.get('name', first_model.get('model', ''))
-                elif hasattr(first_model, 'model'):
-                    MODEL_NAME = first_model.model
-                elif hasattr(first_model, 'name'):
-                    MODEL_NAME = first_model.name
-                else:
-                    MODEL_NAME = str(first_model)
-                print(f"⚠️ Using first available model: {MODEL_NAME}", file=sys.stderr)
-            
-            if not MODEL_NAME:
-                print("⚠️ No models found in Ollama!", file=sys.stderr)
-                return None
-            
-            prompt = f"""You are analyzing text extracted from an event banner using OCR.
+        With on_event, llm_timeout or cancel the reply is streamed: tokens are
+        passed to on_event as they arrive and generation is abandoned after
+        llm_timeout seconds or once cancel is set (raising Cancelled).
+        fields limits the request to those field names (default: all LLM_FIELDS).
+        Token counts and whether the reply needed repair go to trace["llm"].
+        """
+        print("🔍 Step 2: Structuring text with Llama...", file=sys.stderr)
+        
+        if self.structuring["mode"] == "schema":
+            request, info = llm_prompt.build_request(
+                ocr_text, fields, self.structuring["ocr_tokens"], self.structuring["num_predict"]
+            )
+            if info["duplicate_lines"] or info["trimmed_lines"]:
+                print(f"✂️  OCR text {info['tokens_in']} -> {info['tokens_out']} tokens "
+                      f"({info['duplicate_lines']} repeated, {info['trimmed_lines']} trimmed lines)", file=sys.stderr)
+        else:
+            request, info = self._legacy_request(ocr_text, fields), {}
+        
+        if on_event is None and llm_timeout is None and cancel is None:
+            response = self.llm.chat(**request)
+            response_text = response['message']['content']
+        else:
+            response_text, response = self._stream_chat(request, on_event, llm_timeout, cancel)
+        usage = llm_prompt.usage(response)
+        print("✅ Llama structuring complete!", file=sys.stderr)
+        print(f"📄 Raw response (first 200 chars): {response_text[:200]}...", file=sys.stderr)
+        
+        event_data, repaired = llm_prompt.parse_reply(response_text)
+        if trace is not None:
+            trace["llm"] = {
+                "prompt_mode": self.structuring["mode"],
+                "ocr_tokens": info.get("tokens_out"),
+                **usage,
+                "reply": "invalid" if event_data is None else "repaired" if repaired else "ok"
+            }
+        if usage["prompt_tokens"] is not None:
+            print(f"🔢 Llama tokens: {usage['prompt_tokens']} prompt, {usage['completion_tokens']} completion", file=sys.stderr)
+        if event_data is None:
+            print("⚠️ Llama produced invalid JSON", file=sys.stderr)
+            print(f"Response was: {response_text[:500]}", file=sys.stderr)
+            return None
+        if repaired:
+            print(f"🩹 Repaired truncated/wrapped JSON (stopped: {usage['done_reason'] or 'cut off'})", file=sys.stderr)
+        
+        event_data = self.validate_and_normalize_event_data(event_data)
+        print(f"✨ Extracted {len([v for v in event_data.values() if v and v != []])} fields", file=sys.stderr)
+        return event_data
+
+    @staticmethod
+    def _legacy_request(ocr_text, fields=None):
+        """The original prompt: full OCR text inside the instructions, format='json', no cap"""
+        wanted = [(name, hint) for name, hint in LLM_FIELDS if fields is None or name in fields]
+        field_list = "\n".join(f"- {name}: {hint}" for name, hint in wanted)
+        
+        prompt = f"""You are analyzing text extracted from an event banner using OCR.
 
 OCR EXTRACTED TEXT:
 {ocr_text}
@@ -480,19 +958,7 @@ OCR EXTRACTED TEXT:
 Extract structured event information from this text and return a JSON object.
 
 Required fields:
-- title: Main event name/title (usually first major text)
-- description: Brief description if present
-- category: ONE of: workshop, seminar, competition, conference, cultural, sports, social, academic
-- venue_name: Exact venue/location name (look for keywords like "venue:", "at", "centre", "hall", etc.)
-- venue_address: Full address if present
-- event_date: Date in YYYY-MM-DD format (convert "28 December 2025" to "2025-12-28")
-- event_time: Time in HH:MM 24-hour format
-- registration_deadline: Deadline in YYYY-MM-DD format if mentioned
-- contact_email: Email address if present
-- contact_phone: Phone number if present
-- entry_fee: Fee amount, or "0" if free or not mentioned
-- organizer: Organizing institution/company (look for university names, company names)
-- tags: Array of relevant keywords
+{field_list}
 
 IMPORTANT:
 - Use empty string "" for missing fields ([] for tags)
@@ -502,59 +968,158 @@ IMPORTANT:
 
 Return ONLY valid JSON."""
 
-            response = ollama.chat(
-                model=MODEL_NAME,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt,
-                }],
-                format='json',
-                options={
-                    'temperature': 0.1,
-                }
-            )
-            
-            response_text = response['message']['content']
-            print("✅ Llama structuring complete!", file=sys.stderr)
-            print(f"📄 Raw response (first 200 chars): {response_text[:200]}...", file=sys.stderr)
-            
-            # Parse JSON response
+        return dict(
+            messages=[{
+                'role': 'user',
+                'content': prompt,
+            }],
+            format='json',
+            options={
+                'temperature': 0.1,
+            }
+        )
+
+    def _stream_chat(self, request, on_event=None, llm_timeout=None, cancel=None):
+        """Stream a chat reply, forwarding tokens and cutting off slow tails
+        
+        Returns (text, final chunk); the final chunk (with Ollama's token
+        counts) is None when generation was cut off.
+        """
+        parts = []
+        final = None
+        start = time.time()
+        stream = self.llm.chat(stream=True, **request)
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    print(f"🛑 LLM generation aborted after {time.time() - start:.1f}s ({len(parts)} chunks)", file=sys.stderr)
+                    raise Cancelled("llm")
+                token = chunk['message']['content']
+                parts.append(token)
+                if on_event and token:
+                    on_event({"event": "llm_token", "text": token})
+                if chunk.get('done'):
+                    final = chunk
+                if llm_timeout is not None and time.time() - start > llm_timeout:
+                    print(f"⏱️  LLM cut off after {llm_timeout:.1f}s", file=sys.stderr)
+                    break
+        finally:
+            # Closing the generator drops the HTTP response, which stops generation
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+        return "".join(parts), final
+
+    def structure_text(self, ocr_text, on_event=None, llm_timeout=None, trace=None, cancel=None):
+        """Structure OCR text, using the LLM only for what the rules can't read
+        
+        Returns (event_data, method): the rule extractor's fields alone when
+        they are complete enough or Ollama is unavailable, otherwise the rule
+        fields merged over the LLM's answer for the missing fields.
+        """
+        start_time = time.time()
+        fields = rule_extractor.extract_fields(ocr_text)
+        score = rule_extractor.completeness(fields)
+        self._record(trace, "rules", time.time() - start_time)
+        self._span(trace, "rules", start_time, fields=len(fields))
+        print(f"📐 Rules filled {len(fields)} fields ({score*100:.0f}% of core) in {(time.time() - start_time)*1000:.1f}ms", file=sys.stderr)
+        if on_event:
+            on_event({"event": "rules", "fields": sorted(fields), "completeness": round(score, 2)})
+        
+        if rule_extractor.is_complete(fields, self.rules_min_completeness):
+            print("⚡ Core fields found by rules, skipping Llama", file=sys.stderr)
+            return self.validate_and_normalize_event_data(dict(fields)), "rules"
+        
+        check_cancelled(cancel, "llm")
+        if self.check_ollama():
+            missing = rule_extractor.missing_fields(fields, [name for name, _ in LLM_FIELDS])
+            llm_start = time.time()
             try:
-                event_data = json.loads(response_text)
-                # Validate and normalize
-                event_data = self.validate_and_normalize_event_data(event_data)
-                print(f"✨ Extracted {len([v for v in event_data.values() if v and v != []])} fields", file=sys.stderr)
-                return event_data
-                
-            except json.JSONDecodeError as json_err:
-                print(f"⚠️ Llama produced invalid JSON: {json_err}", file=sys.stderr)
-                print(f"Response was: {response_text[:500]}", file=sys.stderr)
-                return None
-                
+                # Without any rule fields there's nothing to narrow the prompt with
+                event_data = self.structure_with_ollama(ocr_text, on_event, llm_timeout, missing if fields else None, cancel, trace)
+            except Cancelled:
+                self._record(trace, "llm", time.time() - llm_start)
+                raise
+            except Exception as e:
+                self._report_error(e)
+                event_data = None
+            self._record(trace, "llm", time.time() - llm_start)
+            self._span(trace, "llm", llm_start, model=self.ollama_model, requested=len(missing) if fields else len(LLM_FIELDS))
+            if event_data:
+                if not fields:
+                    return event_data, "llama"
+                event_data.update(fields)
+                return self.validate_and_normalize_event_data(event_data), "rules_llama"
+        
+        if fields:
+            print("⚠️ Llama unavailable, returning rule-based fields only", file=sys.stderr)
+            return self.validate_and_normalize_event_data(dict(fields)), "rules_fallback"
+        return None, None
+
+    def _report_error(self, e):
+        print(f"⚠️ Hybrid Analysis Error: {str(e)}", file=sys.stderr)
+        print(f"🔍 DEBUG: Error type: {type(e).__name__}", file=sys.stderr)
+        print(f"🔍 DEBUG: Error details: {repr(e)}", file=sys.stderr)
+        import traceback
+        print("🔍 DEBUG: Full traceback:", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+
+    def analyze_with_ollama(self, image, on_event=None, llm_timeout=None, trace=None, cancel=None):
+        """Analyze image using EasyOCR + rules + Ollama text-LLM (hybrid approach)
+        
+        Returns (event_data, method) like structure_text, or (None, None).
+        Raises Cancelled if cancel is set before the analysis completes.
+        """
+        print(f"🧠 Analyzing with EasyOCR + Ollama hybrid approach...", file=sys.stderr)
+        start_time = time.time()
+        
+        try:
+            check_cancelled(cancel, "queued")
+            candidates, image, image_hash = self.find_duplicate(image, on_event, trace)
+            duplicate = self.confirm_duplicate(candidates, on_event=on_event)
+            if duplicate:
+                return duplicate, "phash"
+            ocr = self.extract_text(image, on_event=on_event, trace=trace, cancel=cancel)
+            if ocr is None:
+                return None, None
+            duplicate = self.confirm_duplicate(candidates, ocr[0], on_event)
+            if duplicate:
+                return duplicate, "phash"
+            event_data, method = self.structure_text(ocr[0], on_event, llm_timeout, trace, cancel)
+            self.remember(image_hash, event_data, method, ocr[0])
+            return event_data, method
+        
+        except Cancelled:
+            raise
         except Exception as e:
-            print(f"⚠️ Hybrid Analysis Error: {str(e)}", file=sys.stderr)
-            print(f"🔍 DEBUG: Error type: {type(e).__name__}", file=sys.stderr)
-            print(f"🔍 DEBUG: Error details: {repr(e)}", file=sys.stderr)
-            import traceback
-            print("🔍 DEBUG: Full traceback:", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-            return None
+            self._report_error(e)
+            return None, None
+        finally:
+            self._span(trace, "analyze_with_ollama", start_time)
 
+    # debug_info method names for structure_text results
+    METHOD_NAMES = {
+        "llama": "{backend}_llama_hybrid",
+        "rules_llama": "{backend}_rules_llama_hybrid",
+        "rules": "{backend}_rules",
+        "rules_fallback": "{backend}_rules_fallback",
+        "phash": "phash_duplicate",
+    }
 
-    def analyze(self, image_path):
-        """Main analysis function - uses hybrid OCR + Llama approach"""
-        print(f"Analyzing image: {image_path}", file=sys.stderr)
+    def build_result(self, event_data, method="llama", trace=None):
+        """Wrap structured event data (or None) in the API response format
         
-        # Use Hybrid OCR + Llama Approach
-        hybrid_result = self.analyze_with_ollama(image_path)
-        if hybrid_result:
-             print(f"✨ Used {self.ocr_backend.upper()}OCR + Llama for analysis", file=sys.stderr)
+        A trace from new_trace is copied into debug_info (timings, ocr).
+        """
+        if event_data:
+             print(f"✨ Used {self.ocr_backend.upper()}OCR + {method} for analysis", file=sys.stderr)
              return {
                 "success": True,
-                "event_data": hybrid_result,
+                "event_data": event_data,
                 "debug_info": {
-                    "method": f"{self.ocr_backend}_llama_hybrid",
-                    "ocr_backend": self.ocr_backend
+                    "method": self.METHOD_NAMES[method].format(backend=self.ocr_backend),
+                    "ocr_backend": self.ocr_backend,
+                    **(trace or {})
                 }
              }
         
@@ -563,9 +1128,116 @@ Return ONLY valid JSON."""
         return {
             "success": False,
             "error": "Failed to analyze banner. Ollama might not be running or OCR extracted no text.",
-            "debug_info": {"method": "hybrid_failed"}
+            "debug_info": {"method": "hybrid_failed", **(trace or {})}
         }
 
+    def cancelled_result(self, stage, trace=None):
+        """Response for an analysis abandoned at stage (debug_info.cancelled_at)"""
+        return {
+            "success": False,
+            "error": "Analysis cancelled",
+            "debug_info": {"method": "cancelled", "cancelled_at": stage, **(trace or {})}
+        }
+
+    def analyze(self, image, on_event=None, llm_timeout=None, tracing=False, profile=False, cancel=None):
+        """Main analysis function - uses hybrid OCR + Llama approach
+        
+        Args:
+            image: File path, encoded image bytes, or numpy array
+            on_event: Optional callback receiving progress dicts (decoded,
+                      ocr_strategy, ocr_best, ocr_result, llm_token)
+            llm_timeout: Seconds after which LLM generation is cut off
+            tracing: Record nested stage spans in debug_info["spans"]
+            profile: Also sample this thread's stack into debug_info["profile"]
+            cancel: Optional threading.Event-like flag; once set the analysis
+                    stops at the next checkpoint (between OCR strategies, per
+                    LLM chunk) and a cancelled result is returned
+        """
+        label = image if isinstance(image, str) else f"<{type(image).__name__}>"
+        print(f"Analyzing image: {label}", file=sys.stderr)
+        start_time = time.time()
+        trace = self.new_trace(spans=tracing or profile)
+        sampler = StackSampler().start() if profile else None
+        
+        # Use Hybrid OCR + Llama Approach
+        try:
+            event_data, method = self.analyze_with_ollama(image, on_event, llm_timeout, trace, cancel)
+        except Cancelled as e:
+            print(f"🛑 {e} after {time.time() - start_time:.1f}s", file=sys.stderr)
+            self._record(trace, "total", time.time() - start_time)
+            return self.cancelled_result(e.stage, trace)
+        finally:
+            if sampler:
+                trace["profile"] = sampler.stop()
+        self._record(trace, "total", time.time() - start_time)
+        self._span(trace, "analyze", start_time, method=method, label=label)
+        return self.build_result(event_data, method, trace)
+
+    def analyze_batch(self, images, batch_size=16, llm_workers=2, cancel=None):
+        """Analyze many banners, yielding (index, result) as each one finishes
+        
+        OCR runs image after image on the calling thread (it saturates the
+        CPU/GPU on its own) with the recognizer batching batch_size text crops
+        per forward pass, while Ollama structuring for finished images runs
+        on llm_workers threads, so the LLM call for one banner overlaps the
+        OCR of the next. Once cancel is set no further images are started
+        and the ones in flight come back as cancelled results.
+        """
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+        
+        print(f"📚 Batch analysis of {len(images)} images", file=sys.stderr)
+        
+        def structure(ocr_text, image_hash, trace):
+            try:
+                event_data, method = self.structure_text(ocr_text, trace=trace, cancel=cancel)
+                self.remember(image_hash, event_data, method, ocr_text)
+                return self.build_result(event_data, method, trace)
+            except Cancelled as e:
+                return self.cancelled_result(e.stage, trace)
+            except Exception as e:
+                self._report_error(e)
+                return self.build_result(None, trace=trace)
+        
+        pending = {}
+        with ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm") as pool:
+            for index, image in enumerate(images):
+                if cancel is not None and cancel.is_set():
+                    print(f"🛑 Batch cancelled with {len(images) - index} images not started", file=sys.stderr)
+                    break
+                image_hash = None
+                trace = self.new_trace()
+                try:
+                    candidates, image, image_hash = self.find_duplicate(image, trace=trace)
+                    duplicate = self.confirm_duplicate(candidates)
+                    if duplicate:
+                        yield index, self.build_result(duplicate, "phash", trace)
+                        continue
+                    ocr = self.extract_text(image, batch_size=batch_size, trace=trace, cancel=cancel)
+                    duplicate = self.confirm_duplicate(candidates, ocr[0]) if ocr else None
+                    if duplicate:
+                        yield index, self.build_result(duplicate, "phash", trace)
+                        continue
+                except Cancelled as e:
+                    yield index, self.cancelled_result(e.stage, trace)
+                    continue
+                except Exception as e:
+                    self._report_error(e)
+                    ocr = None
+                
+                if ocr is None:
+                    yield index, self.build_result(None, trace=trace)
+                else:
+                    pending[pool.submit(structure, ocr[0], image_hash, trace)] = index
+                
+                # Hand back whatever the LLM finished while we were doing OCR
+                for future in [f for f in pending if f.done()]:
+                    yield pending.pop(future), future.result()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+
 def main():
     if len(sys.argv) != 2:
         print(json.dumps({"success": False, "error": "No image path provided"}))
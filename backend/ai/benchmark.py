@@ -0,0 +1,366 @@
+"""
+Offline per-stage benchmark for BannerAnalyzer
+Runs a directory of banners through each stage separately (decode, every
+preprocessing variant, every OCR strategy, cleanup, rules, LLM, normalization)
+and end to end, then writes JSON that can be compared against a stored baseline
+
+Usage:
+    python benchmark.py ../uploads/banners --fake-ollama --output bench.json
+    python benchmark.py ../uploads/banners --fake-ollama --baseline bench.json
+    python benchmark.py --startup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+from banner_analyzer import BannerAnalyzer, CV2_AVAILABLE, EASYOCR_AVAILABLE
+from strategy_scheduler import StrategyScheduler
+from llm_client import OLLAMA_AVAILABLE
+from llm_router import create_client, parse_hosts
+import rule_extractor
+
+if CV2_AVAILABLE:
+    from image_io import decode_image
+    from preprocessing import PreprocessPipeline, VARIANT_BUILDERS
+    from text_regions import estimate_layout
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
+
+# Run in a fresh interpreter per backend, so nothing is already imported
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from banner_analyzer import BannerAnalyzer, EASYOCR_AVAILABLE, PADDLEOCR_AVAILABLE
+import onnx_ocr
+import_seconds = time.perf_counter() - start
+from benchmark import peak_rss_mb
+report = {"import_seconds": import_seconds, "import_rss_mb": peak_rss_mb(),
+          "installed": PADDLEOCR_AVAILABLE if sys.argv[1] == "paddle" else EASYOCR_AVAILABLE,
+          "onnx_graphs": bool(onnx_ocr.find_models()) if sys.argv[1] == "onnx" else None}
+analyzer = BannerAnalyzer(ocr_backend=sys.argv[1])
+start = time.perf_counter()
+analyzer.warm_up()
+report.update(warm_up_seconds=time.perf_counter() - start, warm_up_rss_mb=peak_rss_mb(),
+              heavy_modules=sorted(m for m in ("torch", "easyocr", "onnxruntime", "paddleocr", "paddle") if m in sys.modules))
+print(json.dumps(report))
+"""
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}  # stage -> [seconds]
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        stages = {}
+        for stage, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            stages[stage] = {
+                "count": len(ordered),
+                "mean": statistics.mean(ordered),
+                "p50": statistics.median(ordered),
+                "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+                "min": ordered[0],
+                "max": ordered[-1],
+                "total": sum(ordered)
+            }
+        return stages
+
+
+def find_banners(directory, limit=None):
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+
+def ocr_text(results):
+    """Join OCR results the way extract_text_ocr does (top to bottom, prob > 0.4)"""
+    ordered = sorted(results, key=lambda x: x[0][0][1])
+    return "\n".join(text for _, text, prob in ordered if prob > 0.4)
+
+
+def summarize_llm(samples):
+    """Mean token counts and reply outcomes over end-to-end runs (debug_info["llm"])"""
+    def mean(key):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        return round(statistics.mean(values), 1) if values else None
+    replies = {}
+    for s in samples:
+        replies[s.get("reply")] = replies.get(s.get("reply"), 0) + 1
+    return {
+        "calls": len(samples),
+        "prompt_tokens_mean": mean("prompt_tokens"),
+        "completion_tokens_mean": mean("completion_tokens"),
+        "ocr_tokens_mean": mean("ocr_tokens"),
+        "replies": replies
+    }
+
+
+def benchmark_image(analyzer, data, timer, use_llm=True):
+    """Time every stage for one banner, independently of early exit"""
+    with timer.time("decode"):
+        img = decode_image(data, max_size=2048)
+    if img is None:
+        print("⚠️  Could not decode banner, skipping stages", file=sys.stderr)
+        return
+
+    pipeline = PreprocessPipeline(img, max_size=2048)
+    with timer.time("preprocess.gray"):
+        pipeline.gray
+    plan = None
+    if analyzer.adaptive_canvas:
+        with timer.time("layout"):
+            plan = estimate_layout(pipeline.gray)
+            pipeline.crop(plan.box)
+    variants = {}
+    for name in VARIANT_BUILDERS:
+        with timer.time(f"preprocess.{name}"):
+            variants[name] = pipeline[name]
+
+    best_text = ""
+    if analyzer.ocr_backend != 'paddle' and EASYOCR_AVAILABLE:
+        regions = None
+        if analyzer.ocr_mode == 'two_stage':
+            with timer.time("ocr.detect"):
+                regions = analyzer.detect_text_regions(variants[analyzer.DETECTION_STRATEGY], plan)
+        for name, variant in variants.items():
+            with timer.time(f"ocr.{name}"):
+                results = analyzer._ocr_pass(variant, regions, plan=plan)
+            text = ocr_text(results)
+            if len(text) > len(best_text):
+                best_text = text
+
+    with timer.time("clean_ocr_text"):
+        cleaned = analyzer.clean_ocr_text(best_text)
+    with timer.time("rules"):
+        rule_extractor.extract_fields(cleaned)
+
+    if use_llm and cleaned:
+        start = time.perf_counter()
+        try:
+            event_data = analyzer.structure_with_ollama(cleaned)
+        except Exception as e:
+            # Ollama went away mid-run: keep the OCR numbers, time the failure separately
+            timer.record("llm_failed", time.perf_counter() - start)
+            print(f"⚠️  LLM stage failed: {e}", file=sys.stderr)
+            return
+        timer.record("llm", time.perf_counter() - start)
+        if event_data:
+            with timer.time("normalize"):
+                analyzer.validate_and_normalize_event_data(dict(event_data))
+
+
+def measure_startup(backend):
+    """Import time/RSS of banner_analyzer and warm-up time/RSS for one OCR backend"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    done = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT, backend],
+        cwd=here, capture_output=True, text=True, timeout=600
+    )
+    if done.returncode != 0:
+        return {"error": done.stderr.strip().splitlines()[-1] if done.stderr.strip() else f"exit code {done.returncode}"}
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def print_startup(startup):
+    print(f"\n{'backend':<10}{'import s':>10}{'import MB':>11}{'warm-up s':>11}{'warm-up MB':>12}  modules loaded", file=sys.stderr)
+    for backend, r in startup.items():
+        if "error" in r:
+            print(f"{backend:<10}❌ {r['error']}", file=sys.stderr)
+            continue
+        print(f"{backend:<10}{r['import_seconds']:>10.2f}{r['import_rss_mb'] or 0:>11.0f}{r['warm_up_seconds']:>11.2f}"
+              f"{r['warm_up_rss_mb'] or 0:>12.0f}  {', '.join(r['heavy_modules']) or '-'}"
+              f"{'' if r['installed'] else ' (backend not installed)'}", file=sys.stderr)
+
+
+def compare(current, baseline, tolerance, min_delta=0.001):
+    """Stages whose p50 (and peak RSS) grew by more than tolerance over baseline"""
+    regressions = []
+    for stage, stats in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        if stats["p50"] > before["p50"] * (1 + tolerance) and stats["p50"] - before["p50"] > min_delta:
+            regressions.append({
+                "stage": stage,
+                "baseline_p50": before["p50"],
+                "p50": stats["p50"],
+                "change": stats["p50"] / before["p50"] - 1 if before["p50"] else None
+            })
+    rss, before_rss = current.get("peak_rss_mb"), baseline.get("peak_rss_mb")
+    if rss and before_rss and rss > before_rss * (1 + tolerance):
+        regressions.append({"stage": "peak_rss_mb", "baseline_p50": before_rss, "p50": rss, "change": rss / before_rss - 1})
+    return regressions
+
+
+def print_report(report, regressions=None):
+    print(f"\n{'stage':<28}{'count':>6}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}", file=sys.stderr)
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<28}{stats['count']:>6}{stats['p50']*1000:>10.1f}{stats['p95']*1000:>10.1f}{stats['total']:>10.2f}", file=sys.stderr)
+    print(f"\n📈 Peak RSS: {report['peak_rss_mb']} MB", file=sys.stderr)
+    if regressions is None:
+        return
+    if not regressions:
+        print("✅ No regressions against baseline", file=sys.stderr)
+    for r in regressions:
+        change = f"+{r['change']*100:.0f}%" if r['change'] is not None else "new cost"
+        print(f"❌ Regression: {r['stage']} {r['baseline_p50']:.4f} -> {r['p50']:.4f} ({change})", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage BannerAnalyzer benchmark")
+    parser.add_argument("directory", nargs="?", help="Directory of banner images (optional with --startup)")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p50 slowdown before a stage counts as regressed (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument("--limit", type=int, help="Only use the first N banners")
+    parser.add_argument("--backend", default="easy", choices=["easy", "onnx", "paddle"])
+    parser.add_argument("--ocr-mode", default="two_stage", choices=["two_stage", "full"])
+    parser.add_argument("--fake-ollama", action="store_true", help="Answer LLM calls from a local fake server")
+    parser.add_argument("--fake-ollama-delay", type=float, default=0.0, help="Seconds each fake LLM call takes")
+    parser.add_argument("--no-llm", action="store_true", help="Skip the LLM stage and end-to-end runs")
+    parser.add_argument("--llm-prompt", default="schema", choices=["schema", "legacy"],
+                        help="Structuring prompt (compare token counts with the legacy one)")
+    parser.add_argument("--fixed-canvas", action="store_true", help="OCR the whole image at canvas 2560 (no layout estimate)")
+    parser.add_argument("--startup", action="store_true", help="Also measure import and warm-up time/memory per OCR backend")
+    args = parser.parse_args()
+
+    startup = None
+    if args.startup:
+        startup = {backend: measure_startup(backend) for backend in ("easy", "onnx", "paddle")}
+        print_startup(startup)
+        if not args.directory:
+            print(json.dumps({"startup": startup}, indent=2))
+            return
+    if not args.directory:
+        parser.error("directory is required unless --startup is given")
+
+    if not CV2_AVAILABLE:
+        print("❌ OpenCV is required for the benchmark", file=sys.stderr)
+        sys.exit(1)
+
+    banners = find_banners(args.directory, args.limit)
+    if not banners:
+        print(f"❌ No banners found in {args.directory}", file=sys.stderr)
+        sys.exit(1)
+
+    host = os.environ.get("OLLAMA_HOST") or None
+    hosts = parse_hosts(os.environ.get("OLLAMA_HOSTS"))
+    if args.fake_ollama:
+        from fake_ollama import start_fake_ollama
+        _, host = start_fake_ollama(delay=args.fake_ollama_delay)
+        hosts = []
+    use_llm = not args.no_llm and OLLAMA_AVAILABLE
+
+    # In-memory scheduler so benchmark runs don't skew the production strategy stats
+    analyzer = BannerAnalyzer(
+        ocr_backend=args.backend,
+        scheduler=StrategyScheduler(),
+        ocr_mode=args.ocr_mode,
+        llm=create_client(host=host, hosts=hosts) if use_llm else None,
+        adaptive_canvas=not args.fixed_canvas,
+        structuring={"mode": args.llm_prompt}
+    )
+    if use_llm and not analyzer.check_ollama():
+        print(f"❌ Ollama is not reachable at {hosts or host or 'the default host'} or has no model - "
+              f"start it, or run with --fake-ollama or --no-llm", file=sys.stderr)
+        sys.exit(1)
+
+    timer = StageTimer()
+    with timer.time("load_models"):
+        analyzer.load_models()
+
+    # Untimed warm-up so one-off initialisation doesn't land in the first sample
+    with open(banners[0], 'rb') as f:
+        benchmark_image(analyzer, f.read(), StageTimer(), use_llm)
+
+    started = time.time()
+    llm_samples = []
+    for _ in range(args.repeat):
+        for path in banners:
+            print(f"⏱️  {os.path.basename(path)}", file=sys.stderr)
+            with open(path, 'rb') as f:
+                data = f.read()
+            benchmark_image(analyzer, data, timer, use_llm)
+            if use_llm:
+                with timer.time("end_to_end"):
+                    result = analyzer.analyze(data)
+                if "llm" in result.get("debug_info", {}):
+                    llm_samples.append(result["debug_info"]["llm"])
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "images": len(banners),
+        "repeat": args.repeat,
+        "wall_seconds": time.time() - started,
+        "config": {
+            "ocr_backend": analyzer.ocr_backend,
+            "ocr_mode": analyzer.ocr_mode,
+            "adaptive_canvas": analyzer.adaptive_canvas,
+            "ollama_model": analyzer.ollama_model,
+            "fake_ollama": args.fake_ollama,
+            "llm_prompt": args.llm_prompt
+        },
+        "stages": timer.summary(),
+        "peak_rss_mb": peak_rss_mb()
+    }
+    if llm_samples:
+        report["llm"] = summarize_llm(llm_samples)
+        print(f"\n🔢 LLM tokens per banner: {report['llm']['prompt_tokens_mean']} prompt, "
+              f"{report['llm']['completion_tokens_mean']} completion; replies {report['llm']['replies']}", file=sys.stderr)
+    if startup:
+        report["startup"] = startup
+
+    regressions = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+    print_report(report, regressions)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
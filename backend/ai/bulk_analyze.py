@@ -0,0 +1,235 @@
+"""
+Bulk banner analysis for backfills and re-analysis after prompt/model changes
+Loads the models once, analyzes many images (in worker processes with
+--workers > 1) and appends one JSON line per image, so an interrupted run
+picks up where it stopped
+
+Usage:
+    python bulk_analyze.py ../uploads/banners --output results.jsonl
+    python bulk_analyze.py "archive/**/*.jpg" --manifest more.txt --output results.jsonl --workers 4
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from banner_analyzer import BannerAnalyzer
+from settings import analyzer_config
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
+
+
+def _images_in(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def read_manifest(path):
+    """Image paths from a manifest: one per line, '#' comments, relative to the manifest"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line if os.path.isabs(line) else os.path.join(base, line)
+
+
+def collect_inputs(sources, manifests=()):
+    """Absolute image paths from directories, globs, files and manifests, deduplicated in order"""
+    seen = set()
+    paths = []
+
+    def add(path):
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+
+    for source in sources:
+        if os.path.isdir(source):
+            for path in _images_in(source):
+                add(path)
+        elif os.path.isfile(source):
+            add(source)
+        else:
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                print(f"⚠️  Nothing matches {source}", file=sys.stderr)
+            for path in matches:
+                if os.path.isdir(path):
+                    for image in _images_in(path):
+                        add(image)
+                elif path.lower().endswith(IMAGE_EXTENSIONS):
+                    add(path)
+    for manifest in manifests:
+        for path in read_manifest(manifest):
+            if os.path.isfile(path):
+                add(path)
+            else:
+                print(f"⚠️  {path} (from {manifest}) does not exist, skipping", file=sys.stderr)
+    return paths
+
+
+def ends_cleanly(path):
+    """True for an empty file or one whose last line is complete"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def load_done(output, retry_failed=False):
+    """Paths already recorded in the output file (successful ones only with retry_failed)"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Last line of a run that was killed mid-write
+            if retry_failed and not record.get("result", {}).get("success"):
+                continue
+            done.add(record["path"])
+    return done
+
+
+class Progress:
+    """Throughput and ETA over the images handled in this run"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.time()
+
+    def update(self, path, result):
+        self.done += 1
+        if not result.get("success"):
+            self.failed += 1
+        elapsed = time.time() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        method = (result.get("debug_info") or {}).get("method", "error")
+        print(f"[{self.done}/{self.total}] {rate * 60:.1f} img/min, ETA {format_duration(eta)} "
+              f"- {os.path.basename(path)} ({method})", file=sys.stderr)
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        return (f"✅ {self.done - self.failed} analyzed, ❌ {self.failed} failed in {format_duration(elapsed)}"
+                f" ({self.done / elapsed * 60 if elapsed else 0:.1f} img/min)")
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def failure(error):
+    return {"success": False, "error": str(error)}
+
+
+def run_in_process(analyzer, paths, llm_workers):
+    """Yield (path, result): OCR on this thread, LLM calls overlapped on llm_workers threads"""
+    for index, result in analyzer.analyze_batch(paths, llm_workers=llm_workers):
+        yield paths[index], result
+
+
+def run_in_pool(config, paths, workers):
+    """Yield (path, result) from a pool of worker processes, keeping each one busy"""
+    from worker_pool import WorkerPool
+
+    pool = WorkerPool(workers, config)
+    pool.start()
+    pending = {}
+    remaining = iter(paths)
+    try:
+        while True:
+            # Two queued per worker: enough to hide hand-over gaps, not every image in memory
+            while len(pending) < 2 * workers:
+                path = next(remaining, None)
+                if path is None:
+                    break
+                try:
+                    with open(path, 'rb') as f:
+                        pending[pool.submit(f.read())] = path
+                except OSError as e:
+                    yield path, failure(e)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    yield path, future.result()
+                except Exception as e:
+                    yield path, failure(e)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many banners into a resumable JSONL file")
+    parser.add_argument("sources", nargs="*", help="Image files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--manifest", action="append", default=[], help="File listing image paths, one per line (repeatable)")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Analyzer processes (default 1: in-process, LLM calls overlapped with OCR)")
+    parser.add_argument("--llm-workers", type=int, default=2, help="Concurrent LLM calls with --workers 1")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-analyze inputs whose recorded result failed")
+    parser.add_argument("--limit", type=int, help="Stop after N new images")
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.sources, args.manifest)
+    if not paths:
+        parser.error("no images found (give directories, globs, files or --manifest)")
+    done = load_done(args.output, args.retry_failed)
+    todo = [path for path in paths if path not in done]
+    if args.limit:
+        todo = todo[:args.limit]
+    print(f"📚 {len(paths)} images, {sum(path in done for path in paths)} already in {args.output}, "
+          f"{len(todo)} to analyze", file=sys.stderr)
+    if not todo:
+        return
+
+    config = analyzer_config()
+    if args.workers > 1:
+        results = run_in_pool(config, todo, args.workers)
+    else:
+        analyzer = BannerAnalyzer.from_config(config)
+        analyzer.warm_up()
+        results = run_in_process(analyzer, todo, args.llm_workers)
+
+    progress = Progress(len(todo))
+    # Line buffered, one complete line per image: a kill loses at most the line being written
+    with open(args.output, 'a', encoding='utf-8', buffering=1) as out:
+        if not ends_cleanly(args.output):
+            out.write("\n")  # Keep our first record off a half-written last line
+        try:
+            for path, result in results:
+                out.write(json.dumps({
+                    "path": path,
+                    "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "result": result
+                }) + "\n")
+                progress.update(path, result)
+        except KeyboardInterrupt:
+            print("\n⏹️  Interrupted - run the same command again to resume", file=sys.stderr)
+        finally:
+            if args.workers == 1:
+                analyzer.scheduler.flush()
+    print(progress.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Minimal stand-in for the Ollama HTTP API
+Serves /api/tags, /api/generate and /api/chat with a canned reply after a fixed
+delay, so the analyzer can be benchmarked or run without a real model. Every
+Nth chat can be made slow to exercise tail latency (e.g. the router's hedging).
+A JSON schema format narrows the reply to its properties, num_predict cuts it
+off, and token counts are estimated like Ollama reports them
+"""
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODEL = "llama3.2:latest"
+
+DEFAULT_REPLY = {
+    "title": "Sample Event",
+    "description": "",
+    "category": "seminar",
+    "venue_name": "Main Hall",
+    "venue_address": "",
+    "event_date": "2025-12-28",
+    "event_time": "10:00",
+    "registration_deadline": "",
+    "contact_email": "",
+    "contact_phone": "",
+    "entry_fee": "0",
+    "organizer": "",
+    "tags": ["sample"]
+}
+
+
+def _reply_content(reply, request):
+    """Canned reply narrowed to a schema's properties, and cut to num_predict 'tokens' (8 chars each)"""
+    schema = request.get("format")
+    if isinstance(schema, dict) and "properties" in schema:
+        reply = {key: reply.get(key, [] if prop.get("type") == "array" else "")
+                 for key, prop in schema["properties"].items()}
+    content = json.dumps(reply)
+    pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+    num_predict = (request.get("options") or {}).get("num_predict")
+    if num_predict is not None and 0 <= num_predict < len(pieces):
+        return pieces[:num_predict], "length"
+    return pieces, "stop"
+
+
+def _usage(request, pieces, done_reason):
+    prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+    return {"done_reason": done_reason, "prompt_eval_count": -(-len(prompt) // 4), "eval_count": len(pieces)}
+
+
+def make_handler(model, reply, delay, slow_every=0, slow_delay=0.0):
+    chats = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except ConnectionResetError:
+                pass  # Client closed a kept-alive connection
+
+        def _send_json(self, obj):
+            body = json.dumps(obj).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json({"models": [{"name": model, "model": model}]})
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/generate":
+                self._send_json({"model": model, "response": "", "done": True})
+                return
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+
+            slow = slow_every and next(chats) % slow_every == 0
+            time.sleep(slow_delay if slow else delay)
+            pieces, done_reason = _reply_content(reply, request)
+            usage = _usage(request, pieces, done_reason)
+            if not request.get("stream", True):
+                self._send_json({
+                    "model": model,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "done": True,
+                    **usage
+                })
+                return
+
+            # Streaming: one NDJSON chunk per ~8 characters, like a token stream
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            chunks = [{"model": model, "message": {"role": "assistant", "content": piece}, "done": False} for piece in pieces]
+            chunks.append({"model": model, "message": {"role": "assistant", "content": ""}, "done": True, **usage})
+            try:
+                for chunk in chunks:
+                    line = (json.dumps(chunk) + "\n").encode()
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client stopped reading (cut off, cancelled or hedged)
+
+    return Handler
+
+
+def start_fake_ollama(port=0, delay=0.0, reply=None, model=DEFAULT_MODEL, slow_every=0, slow_delay=0.0):
+    """Start the fake server on a background thread; returns (server, url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(model, reply or DEFAULT_REPLY, delay, slow_every, slow_delay))
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    print(f"🧪 Fake Ollama listening on {url} (delay {delay}s)", file=sys.stderr)
+    return server, url
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds each chat call takes")
+    parser.add_argument("--slow-every", type=int, default=0, help="Make every Nth chat call slow (0 = never)")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="Seconds a slow chat call takes")
+    args = parser.parse_args()
+    server, _ = start_fake_ollama(args.port, args.delay, slow_every=args.slow_every, slow_delay=args.slow_delay)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
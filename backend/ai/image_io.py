@@ -0,0 +1,107 @@
+"""
+In-memory image decoding for banner analysis
+Decodes paths, raw bytes or numpy arrays straight to a working-size BGR array,
+using reduced-scale decoding so large photos never pay for a full-size decode
+"""
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Header checks only need PIL; decoding needs OpenCV
+try:
+    import cv2
+    # Reduced decode flags (JPEG scales in the DCT domain, other formats decode then shrink)
+    REDUCED_FLAGS = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }
+except ImportError:
+    cv2 = None
+    REDUCED_FLAGS = {}
+
+
+class ImageTooLarge(ValueError):
+    """The header declares more pixels than PIL will open (Image.MAX_IMAGE_PIXELS x 2)"""
+
+
+def read_bytes(source):
+    """Raw encoded bytes for a path or bytes-like source"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    return bytes(source) if isinstance(source, memoryview) else source
+
+
+def image_dimensions(data):
+    """(width, height) from the image header without decoding pixels, or None
+
+    Raises ImageTooLarge for decompression bombs, whose size PIL won't report.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    except Exception:
+        return None
+
+
+def reduction_factor(width, height, max_size):
+    """Largest 1/2/4/8 downscale that still leaves the long side >= max_size"""
+    long_side = max(width, height)
+    for factor in (8, 4, 2):
+        if long_side / factor >= max_size:
+            return factor
+    return 1
+
+
+def fit_to_size(img, max_size):
+    """Downscale so the long side is at most max_size"""
+    height, width = img.shape[:2]
+    if max(height, width) <= max_size:
+        return img
+    scale = max_size / max(height, width)
+    return cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _decode_with_pil(data, max_size):
+    """Fallback for formats OpenCV can't decode (e.g. GIF)"""
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft('RGB', (max_size, max_size))  # JPEG: decode at reduced scale
+        rgb = np.array(img.convert('RGB'))
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def decode_image(source, max_size=2048):
+    """Decode a path, bytes or numpy array to a BGR array no larger than max_size
+
+    Needs OpenCV. Returns None if the data can't be decoded.
+    """
+    if isinstance(source, np.ndarray):
+        return fit_to_size(source, max_size)
+
+    data = read_bytes(source)
+    try:
+        dims = image_dimensions(data)
+    except ImageTooLarge as e:
+        print(f"⚠️  Not decoding image: {e}", file=sys.stderr)
+        return None
+    factor = reduction_factor(*dims, max_size) if dims else 1
+
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_FLAGS[factor])
+    if img is None:
+        try:
+            img = _decode_with_pil(data, max_size)
+        except Exception as e:
+            print(f"⚠️  Could not decode image: {e}", file=sys.stderr)
+            return None
+
+    if factor > 1:
+        print(f"🗜️  Decoded {dims[0]}x{dims[1]} at 1/{factor} scale", file=sys.stderr)
+    return fit_to_size(img, max_size)
+
@@ -0,0 +1,201 @@
+"""
+Background job queue for banner analysis
+Runs blocking analyzer work on a bounded executor so the event loop stays free
+"""
+import math
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """A job was refused at submit time; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason  # "queue_full" or "deadline"
+        self.retry_after = retry_after
+
+
+class Job:
+    """A single analysis job and its lifecycle state"""
+
+    def __init__(self, job_id, filename=None, deadline=None, on_expired=None, cancel=None):
+        self.id = job_id
+        self.filename = filename
+        self.status = "queued"  # queued -> running -> done | failed, or queued -> expired | cancelled
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.deadline = deadline
+        self.on_expired = on_expired
+        # Shared with the analysis (passed to analyze(cancel=...)) so a running job can stop early
+        self.cancel_event = cancel or threading.Event()
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "expired", "cancelled")
+
+    def cancel(self):
+        """Ask the job to stop: a queued job never starts, a running one stops at its next checkpoint"""
+        self.cancel_event.set()
+
+    def to_dict(self):
+        """Serialize job state for the /jobs endpoint"""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status in ("failed", "expired", "cancelled"):
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    def __init__(self, max_workers=2, max_jobs=500, ttl=3600, max_queue=None):
+        """Initialize job manager
+
+        Args:
+            max_workers: Number of analyses allowed to run at the same time
+            max_jobs: Finished jobs kept for polling before the oldest are dropped
+            ttl: Seconds a finished job stays available via /jobs/{id}
+            max_queue: Jobs allowed to wait for a worker before submit raises
+                       Overloaded (None = unbounded)
+        """
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analyzer")
+        self._jobs = {}
+        self._queued = 0
+        self._running = 0
+        self._job_seconds = None  # Moving average run time, for wait estimates
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, filename=None, deadline=None, on_expired=None, cancel=None):
+        """Queue fn(*args) and return its Job immediately
+
+        deadline (a time.time() value) is when the job must have started: if it
+        can't be met the job is refused up front, and if it passes while the job
+        waits, fn never runs and on_expired() is called instead.
+        cancel is the job's threading.Event (one is created if not given); fn
+        should be handed the same event to stop early when the job is cancelled.
+        Raises Overloaded when the queue is full or the deadline can't be met.
+        """
+        job = Job(uuid.uuid4().hex, filename, deadline, on_expired, cancel)
+        with self._lock:
+            wait = self._expected_wait()
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                raise Overloaded("queue_full", self._retry_after(wait))
+            if deadline is not None and time.time() + wait > deadline:
+                raise Overloaded("deadline", self._retry_after(wait))
+            self._prune()
+            self._jobs[job.id] = job
+            self._queued += 1
+        job.future = self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _expected_wait(self):
+        """Seconds a newly queued job would wait for a worker (caller holds the lock)"""
+        ahead = self._queued + self._running - self.max_workers + 1
+        if not self._job_seconds or ahead < 1:
+            return 0.0
+        return ahead / self.max_workers * self._job_seconds
+
+    def _retry_after(self, wait):
+        # Time for the queue to drain by roughly half, at least a second
+        return max(1, math.ceil(wait / 2 if wait else (self._job_seconds or 1)))
+
+    def retry_after(self):
+        """Suggested Retry-After seconds given the current queue"""
+        with self._lock:
+            return self._retry_after(self._expected_wait())
+
+    def cancel(self, job):
+        """Cancel job; returns the status it had ("queued" means it will never run)"""
+        with self._lock:
+            job.cancel()
+            return job.status
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args):
+        with self._lock:
+            self._queued -= 1
+            expired = job.deadline is not None and time.time() > job.deadline
+            cancelled = job.cancel_event.is_set()
+            if not (expired or cancelled):
+                self._running += 1
+                job.status = "running"
+        if cancelled:
+            print(f"🛑 Job {job.id} cancelled before it started", file=sys.stderr)
+            job.error = "Cancelled before analysis started"
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return job
+        if expired:
+            # Its client has given up by now - don't spend OCR time on it
+            print(f"⏰ Job {job.id} expired after {time.time() - job.created_at:.1f}s in the queue", file=sys.stderr)
+            job.error = "Deadline passed before analysis started"
+            job.status = "expired"
+            job.finished_at = time.time()
+            if job.on_expired:
+                job.on_expired()
+            return job
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args)
+            if job.cancel_event.is_set():
+                job.error = "Cancelled during analysis"
+                job.status = "cancelled"
+            else:
+                job.status = "done"
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}", file=sys.stderr)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            seconds = job.finished_at - job.started_at
+            with self._lock:
+                self._running -= 1
+                self._job_seconds = seconds if self._job_seconds is None else 0.8 * self._job_seconds + 0.2 * seconds
+        return job
+
+    def _prune(self):
+        """Drop expired finished jobs (caller holds the lock)"""
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.finished]
+        for job in finished:
+            if now - job.finished_at > self.ttl:
+                del self._jobs[job.id]
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        while len(finished) > self.max_jobs:
+            del self._jobs[finished.pop(0).id]
+
+    def stats(self):
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0, "expired": 0, "cancelled": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            counts["expected_wait"] = round(self._expected_wait(), 2)
+        counts["max_workers"] = self.max_workers
+        counts["max_queue"] = self.max_queue
+        return counts
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,161 @@
+"""
+Long-lived Ollama client for the structuring step
+Resolves the model once, refreshes it in the background, reuses pooled HTTP
+connections and keeps the model loaded between requests
+"""
+import sys
+import threading
+import time
+from importlib.util import find_spec
+
+# ollama (and httpx under it) is imported when the first client is created
+OLLAMA_AVAILABLE = find_spec("ollama") is not None
+
+# Prefer text-only Llama, but can use LLaVA for structuring
+MODEL_PREFERENCES = ["llama3.2", "llama3.1", "llama3", "llama2", "llava"]
+
+# Seconds between preload attempts until the model has loaded once
+PRELOAD_RETRY_SECONDS = 10
+
+
+def model_name(model):
+    """Handle both dict with 'name' key and object with 'model' attribute"""
+    if isinstance(model, dict):
+        return model.get('name', model.get('model', ''))
+    elif hasattr(model, 'model'):
+        return model.model  # Access attribute directly
+    elif hasattr(model, 'name'):
+        return model.name
+    return str(model)
+
+
+def select_model(available_models):
+    """Pick the preferred model from an ollama.list() response"""
+    models = available_models.get('models', [])
+    names = [model_name(model) for model in models]
+
+    # Try to find models in order of preference
+    for pref in MODEL_PREFERENCES:
+        for name in names:
+            if pref in name.lower():
+                return name
+
+    # Fallback to first available model
+    if names:
+        print(f"⚠️ Using first available model: {names[0]}", file=sys.stderr)
+        return names[0]
+    return None
+
+
+class OllamaClient:
+    def __init__(self, host=None, timeout=120, keep_alive="30m", refresh_interval=300):
+        """Initialize client
+
+        Args:
+            host: Ollama URL (default: OLLAMA_HOST or http://localhost:11434)
+            timeout: Seconds before any Ollama HTTP request is abandoned
+            keep_alive: How long Ollama keeps the model loaded after each call
+            refresh_interval: Seconds between background model re-discovery
+        """
+        self.host = host
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.model = None
+        self.last_refresh = None
+        self.last_error = None
+        self.preloaded_model = None
+        import ollama
+        # One httpx-backed client for the process, so connections are pooled
+        self._client = ollama.Client(host=host, timeout=timeout)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Re-discover the preferred model; returns it or None if Ollama is unreachable"""
+        try:
+            available_models = self._client.list()
+        except Exception as e:
+            print(f"⚠️ Cannot connect to Ollama. Is it running? Error: {e}", file=sys.stderr)
+            with self._lock:
+                self.last_error = str(e)
+                self.last_refresh = time.time()
+            return None
+
+        model = select_model(available_models)
+        with self._lock:
+            if model != self.model:
+                print(f"✅ Ollama model: {model} ({len(available_models.get('models', []))} available)", file=sys.stderr)
+            self.model = model
+            self.last_error = None if model else "No models found in Ollama"
+            self.last_refresh = time.time()
+        return model
+
+    def ensure_model(self):
+        """Cached model, resolving it on first use or after a failure"""
+        with self._lock:
+            model = self.model
+        return model or self.refresh()
+
+    def preload(self):
+        """Load the model into memory now so the first real request is not a cold start"""
+        model = self.ensure_model()
+        if not model:
+            return False
+        try:
+            # An empty prompt only loads the model
+            self._client.generate(model=model, prompt='', keep_alive=self.keep_alive)
+            if model != self.preloaded_model:
+                print(f"🔥 Ollama model {model} loaded (keep_alive={self.keep_alive})", file=sys.stderr)
+                self.preloaded_model = model
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not preload Ollama model {model}: {e}", file=sys.stderr)
+            return False
+
+    def chat(self, messages, **kwargs):
+        """ollama.chat against the cached model with keep_alive pinned"""
+        model = self.ensure_model()
+        if not model:
+            raise RuntimeError("No Ollama model available")
+        try:
+            return self._client.chat(model=model, messages=messages, keep_alive=self.keep_alive, **kwargs)
+        except Exception:
+            # The model may have been removed or Ollama restarted - re-resolve next time
+            with self._lock:
+                self.model = None
+            raise
+
+    def start(self, preload=True):
+        """Resolve (and optionally preload) the model, then keep it fresh in the background"""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                self.refresh()
+                # Re-touching the model resets keep_alive, so it survives idle periods
+                if preload:
+                    self.preload()
+                # Retry soon while the model isn't loaded yet (Ollama still starting)
+                interval = self.refresh_interval
+                if preload and self.preloaded_model is None:
+                    interval = min(interval, PRELOAD_RETRY_SECONDS)
+                if self._stop.wait(interval):
+                    return
+
+        self._thread = threading.Thread(target=loop, name="ollama-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "model": self.model,
+                "last_refresh": self.last_refresh,
+                "last_error": self.last_error,
+                "keep_alive": self.keep_alive
+            }
@@ -0,0 +1,223 @@
+"""
+Token-budgeted, schema-constrained prompts for LLM structuring
+The instructions are a fixed system message (identical on every request, so
+Ollama can reuse its evaluated prefix); the OCR text is deduplicated and cut
+to a token budget; the reply is constrained by a JSON schema of the wanted
+fields and capped with num_predict. Replies that still don't parse (cut off
+by the cap or the LLM timeout) are repaired instead of failing the analysis
+"""
+import json
+import re
+
+# Fields the LLM is asked for, in prompt order
+LLM_FIELDS = [
+    ("title", "Main event name/title (usually first major text)"),
+    ("description", "Brief description if present"),
+    ("category", "ONE of: workshop, seminar, competition, conference, cultural, sports, social, academic"),
+    ("venue_name", 'Exact venue/location name (look for keywords like "venue:", "at", "centre", "hall", etc.)'),
+    ("venue_address", "Full address if present"),
+    ("event_date", 'Date in YYYY-MM-DD format (convert "28 December 2025" to "2025-12-28")'),
+    ("event_time", "Time in HH:MM 24-hour format"),
+    ("registration_deadline", "Deadline in YYYY-MM-DD format if mentioned"),
+    ("contact_email", "Email address if present"),
+    ("contact_phone", "Phone number if present"),
+    ("entry_fee", 'Fee amount, or "0" if free or not mentioned'),
+    ("organizer", "Organizing institution/company (look for university names, company names)"),
+    ("tags", "Array of relevant keywords"),
+]
+
+CATEGORIES = ["workshop", "seminar", "competition", "conference", "cultural", "sports", "social", "academic"]
+
+# OCR text tokens sent per banner, and the cap on generated tokens (a full
+# 13-field reply is ~150-250 tokens)
+OCR_TOKEN_BUDGET = 600
+NUM_PREDICT = 384
+# No tokenizer for the served model here; English OCR text averages ~4 characters a token
+CHARS_PER_TOKEN = 4
+# Longer lines are OCR noise (or a paragraph the title won't be in)
+MAX_LINE_CHARS = 200
+# Share of the budget kept from the top of the banner when it has to be cut;
+# the rest comes from the bottom, where contacts and fees usually are
+HEAD_SHARE = 2 / 3
+
+# Schema per field; anything not listed is a plain string
+FIELD_SCHEMAS = {
+    "category": {"type": "string", "enum": CATEGORIES + [""]},
+    "description": {"type": "string", "maxLength": 300},
+    "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 8},
+}
+
+SYSTEM_PROMPT = """You extract event details from text that OCR read off an event banner.
+Reply with one JSON object holding exactly the fields the user lists.
+
+Fields:
+{fields}
+
+Rules:
+- Use "" for a field the text doesn't give ([] for tags); never make information up
+- Read the YEAR of dates carefully from the text
+- Look for patterns like "Venue: X", "Date: Y", "Time: Z"
+- The text may contain misread characters and lines out of order""".format(
+    fields="\n".join(f"- {name}: {hint}" for name, hint in LLM_FIELDS)
+)
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def fit_ocr_text(text, max_tokens=OCR_TOKEN_BUDGET):
+    """OCR text without repeated/noise lines, cut to about max_tokens
+
+    Returns (text, info) where info has tokens_in, tokens_out and the
+    number of lines dropped as duplicates or to fit the budget.
+    """
+    lines = []
+    seen = set()
+    duplicates = 0
+    for raw in text.splitlines():
+        line = " ".join(raw.split())[:MAX_LINE_CHARS]
+        # Same letters and digits = same line read twice (tiles, strategies, casing)
+        key = re.sub(r"[^a-z0-9]", "", line.lower())
+        if len(key) < 2:
+            continue
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        lines.append(line)
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    kept = lines
+    trimmed = 0
+    if sum(len(line) + 1 for line in lines) > budget:
+        head, used = [], 0
+        for line in lines:
+            if used + len(line) + 1 > budget * HEAD_SHARE:
+                break
+            head.append(line)
+            used += len(line) + 1
+        tail = []
+        for line in reversed(lines[len(head):]):
+            if used + len(line) + 1 > budget:
+                break
+            tail.insert(0, line)
+            used += len(line) + 1
+        kept = head + ["..."] + tail
+        trimmed = len(lines) - len(head) - len(tail)
+
+    fitted = "\n".join(kept)
+    return fitted, {
+        "tokens_in": estimate_tokens(text),
+        "tokens_out": estimate_tokens(fitted),
+        "duplicate_lines": duplicates,
+        "trimmed_lines": trimmed
+    }
+
+
+def event_schema(fields):
+    """JSON schema (Ollama's format=) for an object with exactly these fields"""
+    return {
+        "type": "object",
+        "properties": {name: FIELD_SCHEMAS.get(name, {"type": "string"}) for name in fields},
+        "required": list(fields)
+    }
+
+
+def build_request(ocr_text, fields=None, max_tokens=OCR_TOKEN_BUDGET, num_predict=NUM_PREDICT):
+    """Chat request kwargs for structuring ocr_text, and the OCR trimming info
+
+    fields limits the reply to those field names (default: all LLM_FIELDS);
+    only the user message and the schema depend on them, the system prefix
+    never changes.
+    """
+    names = [name for name, _ in LLM_FIELDS if fields is None or name in fields]
+    text, info = fit_ocr_text(ocr_text, max_tokens)
+    request = dict(
+        messages=[
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user', 'content': f"Fields: {', '.join(names)}\n\nOCR text:\n{text}"},
+        ],
+        format=event_schema(names),
+        options={
+            'temperature': 0.1,
+            'num_predict': num_predict,
+        }
+    )
+    return request, info
+
+
+def usage(response):
+    """Token counts from Ollama's final chunk (or a whole reply); None when cut off before it"""
+    if response is None:
+        return {"prompt_tokens": None, "completion_tokens": None, "done_reason": None}
+    return {
+        "prompt_tokens": response.get('prompt_eval_count'),
+        "completion_tokens": response.get('eval_count'),
+        "done_reason": response.get('done_reason')
+    }
+
+
+def _closings(text):
+    """Ways to end a truncated JSON text, most trusted first
+
+    Cut off inside a string, the value (or key) is half-written - a date,
+    time or phone number missing its end - so the text is cut back to the
+    last comma or opening bracket, dropping that pair. Otherwise it is
+    closed where it stops, with the cut-back as the fallback.
+    """
+    stack = []
+    in_string = escape = False
+    safe = None  # (index, open brackets) of the last point between complete values
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            safe = (i + 1, list(stack))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+        elif ch == ",":
+            safe = (i, list(stack))
+    candidates = []
+    if safe:
+        index, open_brackets = safe
+        candidates.append(text[:index] + "".join(reversed(open_brackets)))
+    if not in_string:
+        candidates.insert(0, text + "".join(reversed(stack)))
+    return candidates
+
+
+def parse_reply(text):
+    """The JSON object in an LLM reply, repairing one that was cut off or wrapped
+
+    Returns (data, repaired); data is None if nothing usable could be recovered.
+    """
+    try:
+        data = json.loads(text)
+        return (data, False) if isinstance(data, dict) else (None, False)
+    except ValueError:
+        pass
+    start = text.find("{")
+    if start < 0:
+        return None, False
+    body = text[start:]
+    end = body.rfind("}")
+    candidates = ([body[:end + 1]] if end >= 0 else []) + _closings(body)
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        # An object with no complete pair left is no answer
+        if isinstance(data, dict) and data:
+            return data, True
+    return None, False
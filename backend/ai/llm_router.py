@@ -0,0 +1,323 @@
+"""
+Client-side load balancing across several Ollama servers
+Each call goes to the healthy endpoint with the fewest outstanding requests;
+endpoints that keep failing are ejected for a while, and a call whose first
+token is later than its endpoint's p95 is hedged to a second endpoint
+"""
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from llm_client import OllamaClient
+
+# Consecutive failures before an endpoint is taken out of rotation
+MAX_FAILURES = 3
+EJECT_SECONDS = 30
+# Time-to-first-token samples kept per endpoint, and how many before hedging kicks in
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 95
+
+
+def parse_hosts(value):
+    """Comma/whitespace separated host list (OLLAMA_HOSTS) as a list"""
+    return [host for host in (value or "").replace(",", " ").split() if host]
+
+
+def create_client(host=None, hosts=None, hedge=True, max_failures=MAX_FAILURES,
+                  eject_seconds=EJECT_SECONDS, **client_kwargs):
+    """OllamaClient for a single host, LLMRouter when several are configured"""
+    hosts = list(hosts or [])
+    if len(hosts) > 1:
+        return LLMRouter(hosts, hedge=hedge, max_failures=max_failures,
+                         eject_seconds=eject_seconds, **client_kwargs)
+    return OllamaClient(host=hosts[0] if hosts else host, **client_kwargs)
+
+
+class Endpoint:
+    """One Ollama server and what the router knows about it (guarded by the router lock)"""
+
+    def __init__(self, client):
+        self.client = client
+        self.host = client.host
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0  # Consecutive
+        self.ejected_until = 0.0
+        self.last_error = None
+        self.first_token = deque(maxlen=LATENCY_WINDOW)
+        self.latency = None  # Moving average time to first token
+
+    def percentile(self, q):
+        if len(self.first_token) < HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(self.first_token, q))
+
+    def status(self, now):
+        p95 = self.percentile(HEDGE_PERCENTILE)
+        return {
+            "host": self.host,
+            "model": self.client.model,
+            "healthy": self.ejected_until <= now,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "first_token_p50": round(float(np.percentile(self.first_token, 50)), 3) if self.first_token else None,
+            "first_token_p95": round(p95, 3) if p95 is not None else None
+        }
+
+
+class _Attempt:
+    """A chat stream being opened on one endpoint"""
+
+    def __init__(self, endpoint, hedge=False):
+        self.endpoint = endpoint
+        self.hedge = hedge
+        self.stream = None
+        self.first = None
+        self.error = None
+        self.done = False
+        self.handled = False  # Taken off the results queue
+        self.abandoned = False
+        self.lock = threading.Lock()
+
+
+class LLMRouter:
+    def __init__(self, hosts, hedge=True, max_failures=MAX_FAILURES, eject_seconds=EJECT_SECONDS, **client_kwargs):
+        """Initialize router
+
+        Args:
+            hosts: Ollama URLs, ideally all serving the same model
+            hedge: Duplicate a call to a second endpoint once the first token
+                   is later than the first endpoint's p95
+            max_failures: Consecutive failures that eject an endpoint
+            eject_seconds: How long an ejected endpoint is left out of rotation
+            client_kwargs: OllamaClient settings (timeout, keep_alive, refresh_interval)
+        """
+        self.endpoints = [Endpoint(OllamaClient(host=host, **client_kwargs)) for host in hosts]
+        self.hedge = hedge
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.keep_alive = self.endpoints[0].client.keep_alive
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    # OllamaClient interface
+
+    @property
+    def model(self):
+        return next((e.client.model for e in self.endpoints if e.client.model), None)
+
+    @property
+    def preloaded_model(self):
+        return next((e.client.preloaded_model for e in self.endpoints if e.client.preloaded_model), None)
+
+    def refresh(self):
+        models = [endpoint.client.refresh() for endpoint in self.endpoints]
+        return next((model for model in models if model), None)
+
+    def ensure_model(self):
+        """A model from the first healthy endpoint that has one"""
+        for endpoint in self._healthy():
+            model = endpoint.client.ensure_model()
+            if model:
+                return model
+        return None
+
+    def preload(self):
+        return any([endpoint.client.preload() for endpoint in self.endpoints])
+
+    def start(self, preload=True):
+        for endpoint in self.endpoints:
+            endpoint.client.start(preload)
+
+    def stop(self):
+        for endpoint in self.endpoints:
+            endpoint.client.stop()
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            endpoints = [endpoint.status(now) for endpoint in self.endpoints]
+            hedges, hedge_wins = self.hedges, self.hedge_wins
+        return {
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "hedge": self.hedge,
+            "hedges": hedges,
+            "hedge_wins": hedge_wins,
+            "endpoints": endpoints
+        }
+
+    def chat(self, messages, stream=False, **kwargs):
+        """ollama.chat on the least-loaded endpoint
+
+        Replies are always streamed from Ollama, so a hedged duplicate can be
+        dropped as soon as the other one produces its first token; without
+        stream=True the chunks are joined into one reply.
+        """
+        chunks = self._chat_stream(messages, kwargs)
+        if stream:
+            return chunks
+        parts = []
+        reply = {}
+        for chunk in chunks:
+            parts.append(chunk['message']['content'])
+            if chunk.get('done'):
+                # Token counts and done_reason only come with the last chunk
+                reply = {key: chunk.get(key) for key in ('done', 'done_reason', 'prompt_eval_count', 'eval_count')}
+        return {**reply, "message": {"role": "assistant", "content": "".join(parts)}}
+
+    # Routing
+
+    def _healthy(self, exclude=()):
+        now = time.time()
+        with self._lock:
+            return [e for e in self.endpoints if e not in exclude and e.ejected_until <= now]
+
+    def _pick(self, exclude=()):
+        """Healthy endpoint with the fewest outstanding calls (lowest latency breaks ties)"""
+        now = time.time()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude and e.ejected_until <= now]
+            if not candidates:
+                return None
+            # Endpoints without samples yet count as fast, so they get tried
+            endpoint = min(candidates, key=lambda e: (e.outstanding, e.latency or 0.0))
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _finished(self, endpoint, error=None):
+        """A call on endpoint ended; errors count towards ejection"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                return
+            endpoint.failures += 1
+            endpoint.last_error = str(error)
+            if endpoint.failures >= self.max_failures and endpoint.ejected_until <= time.time():
+                endpoint.ejected_until = time.time() + self.eject_seconds
+                print(f"🚫 Ejecting Ollama endpoint {endpoint.host} for {self.eject_seconds}s "
+                      f"after {endpoint.failures} failures: {error}", file=sys.stderr)
+
+    def _first_token(self, endpoint, seconds):
+        with self._lock:
+            endpoint.first_token.append(seconds)
+            endpoint.latency = seconds if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * seconds
+            if endpoint.ejected_until:
+                print(f"✅ Ollama endpoint {endpoint.host} is answering again", file=sys.stderr)
+            endpoint.failures = 0
+            endpoint.ejected_until = 0.0
+
+    def _open(self, attempt, messages, kwargs, results):
+        """Thread body: start the stream and wait for its first chunk"""
+        endpoint = attempt.endpoint
+        start = time.time()
+        try:
+            attempt.stream = endpoint.client.chat(messages, stream=True, **kwargs)
+            attempt.first = next(attempt.stream)
+            self._first_token(endpoint, time.time() - start)
+        except StopIteration:
+            attempt.error = RuntimeError(f"Empty reply from {endpoint.host}")
+        except Exception as e:
+            attempt.error = e
+        with attempt.lock:
+            attempt.done = True
+            abandoned = attempt.abandoned
+        if abandoned:
+            # The other attempt won - close ours, which stops generation on that server
+            self._close(attempt, attempt.error)
+        else:
+            results.put(attempt)
+
+    def _close(self, attempt, error=None):
+        close = getattr(attempt.stream, 'close', None)
+        if close:
+            close()
+        self._finished(attempt.endpoint, error)
+
+    def _launch(self, endpoint, messages, kwargs, results, hedge=False):
+        attempt = _Attempt(endpoint, hedge)
+        threading.Thread(target=self._open, args=(attempt, messages, kwargs, results),
+                         name="llm-attempt", daemon=True).start()
+        return attempt
+
+    def _winning_attempt(self, messages, kwargs):
+        """First attempt to produce a chunk, hedging or failing over to other endpoints"""
+        results = queue.Queue()
+        primary = self._pick()
+        if primary is None:
+            raise RuntimeError("No healthy Ollama endpoint")
+        tried = [primary]
+        attempts = [self._launch(primary, messages, kwargs, results)]
+        hedge_after = primary.percentile(HEDGE_PERCENTILE) if self.hedge else None
+        hedge_at = time.time() + hedge_after if hedge_after is not None else None
+        pending = 1
+        last_error = None
+
+        while True:
+            timeout = None if hedge_at is None else max(0.0, hedge_at - time.time())
+            try:
+                attempt = results.get(timeout=timeout)
+                attempt.handled = True
+            except queue.Empty:
+                hedge_at = None
+                second = self._pick(exclude=tried)
+                if second is not None:
+                    print(f"🔀 No first token from {primary.host} after {hedge_after:.2f}s (p95), "
+                          f"hedging to {second.host}", file=sys.stderr)
+                    with self._lock:
+                        self.hedges += 1
+                    tried.append(second)
+                    attempts.append(self._launch(second, messages, kwargs, results, hedge=True))
+                    pending += 1
+                continue
+
+            pending -= 1
+            if attempt.error is None:
+                for other in attempts:
+                    if other is attempt:
+                        continue
+                    with other.lock:
+                        other.abandoned = True
+                        done = other.done
+                    if done and not other.handled:
+                        self._close(other, other.error)  # Finished too, but we only need one
+                if attempt.hedge:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return attempt
+
+            self._finished(attempt.endpoint, attempt.error)
+            last_error = attempt.error
+            print(f"⚠️ Ollama endpoint {attempt.endpoint.host} failed: {attempt.error!r}", file=sys.stderr)
+            if pending == 0:
+                fallback = self._pick(exclude=tried)
+                if fallback is None:
+                    raise last_error
+                print(f"↪️  Retrying on {fallback.host}", file=sys.stderr)
+                tried.append(fallback)
+                attempts.append(self._launch(fallback, messages, kwargs, results))
+                pending += 1
+
+    def _chat_stream(self, messages, kwargs):
+        attempt = self._winning_attempt(messages, kwargs)
+        error = None
+        try:
+            yield attempt.first
+            for chunk in attempt.stream:
+                yield chunk
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._close(attempt, error)
@@ -0,0 +1,227 @@
+"""
+Minimal Prometheus metrics for the banner analyzer
+Counters and histograms are updated on the request path (a lock and a bisect
+per observation); gauges are read from callbacks only when /metrics is scraped
+"""
+import bisect
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds: covers cheap stages (ms) through a cold LLM call (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, values)} {_number(count)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {values: list(counts) for values, counts in self._series.items()}
+        for values, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, values, [('le', '+Inf')])} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(counts[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {counts[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value computed at scrape time: callback returns a number or {label tuple: number}"""
+    kind = "gauge"
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.callback = callback
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.callback()
+        except Exception:
+            return lines  # A failing source shouldn't break the whole scrape
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for values, number in sorted(items):
+            if number is None:
+                continue
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {_number(number)}")
+        return lines
+
+
+class CallbackCounter(Gauge):
+    """Counter kept by another object (a cache, an index), read at scrape time"""
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def callback_counter(self, *args, **kwargs):
+        return self.register(CallbackCounter(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "banner_http_request_seconds", "HTTP request latency until the response starts",
+    labels=("method", "path", "status")
+)
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    "banner_analysis_seconds", "Time spent analyzing one banner (excluding queueing)",
+    labels=("method",)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "banner_stage_seconds", "Time per analysis stage; strategy is set for preprocess/ocr",
+    labels=("stage", "strategy")
+)
+OCR_CONFIDENCE = REGISTRY.histogram(
+    "banner_ocr_confidence_percent", "Average confidence of the winning OCR strategy",
+    buckets=(10, 20, 30, 40, 50, 60, 70, 80, 85, 90, 95, 100)
+)
+OCR_CHARACTERS = REGISTRY.histogram(
+    "banner_ocr_characters", "Characters extracted by OCR per banner",
+    buckets=(10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+)
+STRATEGY_WINS = REGISTRY.counter(
+    "banner_ocr_strategy_wins_total", "Banners where this preprocessing strategy gave the best OCR",
+    labels=("strategy",)
+)
+STRATEGY_TRIALS = REGISTRY.counter(
+    "banner_ocr_strategy_trials_total", "OCR passes run per preprocessing strategy",
+    labels=("strategy",)
+)
+REJECTED = REGISTRY.counter(
+    "banner_requests_rejected_total", "Analyses refused or dropped before OCR, by reason",
+    labels=("reason",)
+)
+CANCELLED = REGISTRY.counter(
+    "banner_cancelled_total", "Analyses abandoned because the client went away, by stage reached",
+    labels=("stage",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "banner_llm_tokens_total", "Tokens Ollama evaluated (prompt) and generated (completion) for structuring",
+    labels=("kind",)
+)
+LLM_REPLIES = REGISTRY.counter(
+    "banner_llm_replies_total", "LLM structuring replies that parsed, needed repair or were unusable",
+    labels=("reply",)
+)
+RESULTS = REGISTRY.counter(
+    "banner_results_total", "Fresh analysis results by extraction method",
+    labels=("method", "success")
+)
+
+
+def observe_result(result):
+    """Record the stage timings and OCR stats a fresh analysis carries in debug_info"""
+    debug_info = result.get("debug_info") or {}
+    RESULTS.inc(debug_info.get("method", "unknown"), str(bool(result.get("success"))).lower())
+    if debug_info.get("method") == "cancelled":
+        CANCELLED.inc(debug_info.get("cancelled_at", "unknown"))
+
+    timings = debug_info.get("timings") or {}
+    for stage, value in timings.items():
+        if isinstance(value, dict):
+            for strategy, seconds in value.items():
+                STAGE_SECONDS.observe(seconds, stage, strategy)
+        elif stage == "total":
+            ANALYSIS_SECONDS.observe(value, debug_info.get("method", "unknown"))
+        else:
+            STAGE_SECONDS.observe(value, stage, "")
+
+    ocr = debug_info.get("ocr") or {}
+    if "confidence" in ocr:
+        OCR_CONFIDENCE.observe(ocr["confidence"])
+    if "chars" in ocr:
+        OCR_CHARACTERS.observe(ocr["chars"])
+    if ocr.get("strategy"):
+        STRATEGY_WINS.inc(ocr["strategy"])
+    for strategy in timings.get("ocr", {}):
+        STRATEGY_TRIALS.inc(strategy)
+
+    llm = debug_info.get("llm") or {}
+    if llm.get("reply"):
+        LLM_REPLIES.inc(llm["reply"])
+    for kind in ("prompt", "completion"):
+        if llm.get(f"{kind}_tokens") is not None:
+            LLM_TOKENS.inc(kind, amount=llm[f"{kind}_tokens"])
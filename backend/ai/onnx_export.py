@@ -0,0 +1,183 @@
+"""
+Export EasyOCR's detector and recognizer to ONNX and check the result
+export: writes fp32 graphs (and int8 dynamically quantized ones) to onnx_models/
+check:  OCRs a banner corpus with the PyTorch reader and the ONNX Runtime one
+        and reports text agreement and per-image latency
+
+Usage:
+    python onnx_export.py export
+    python onnx_export.py check ../uploads/banners --min-similarity 0.97
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import time
+
+import onnx_ocr
+
+RECOGNIZER_HEIGHT = 64  # english_g2 input height (EasyOCR's imgH)
+
+
+def _export_recognizer_module(model):
+    """english_g2 with AdaptiveAvgPool2d((None, 1)) spelled as a mean, which exports with a dynamic width"""
+    import torch
+
+    class ExportableRecognizer(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            visual_feature = self.model.FeatureExtraction(image)
+            # [b, c, h, w] -> [b, w, c, h], then pool h away
+            visual_feature = visual_feature.permute(0, 3, 1, 2).mean(dim=3)
+            contextual_feature = self.model.SequenceModeling(visual_feature)
+            return self.model.Prediction(contextual_feature.contiguous())
+
+    return ExportableRecognizer().eval()
+
+
+def export(model_dir, quantize, opset):
+    import easyocr
+    import torch
+
+    os.makedirs(model_dir, exist_ok=True)
+    # fp32 weights: EasyOCR's default on CPU is torch dynamic quantization, which doesn't export
+    reader = easyocr.Reader(['en'], gpu=False, quantize=False, verbose=False)
+    detector_path = onnx_ocr.graph_path(model_dir, onnx_ocr.DETECTOR_NAME)
+    recognizer_path = onnx_ocr.graph_path(model_dir, onnx_ocr.RECOGNIZER_NAME)
+
+    print("📤 Exporting CRAFT detector...", file=sys.stderr)
+    with torch.no_grad():
+        torch.onnx.export(
+            reader.detector.eval(), torch.randn(1, 3, 640, 640), detector_path,
+            input_names=["image"], output_names=["scores", "feature"],
+            dynamic_axes={
+                "image": {0: "batch", 2: "height", 3: "width"},
+                "scores": {0: "batch", 1: "score_height", 2: "score_width"},
+                "feature": {0: "batch", 2: "feature_height", 3: "feature_width"}
+            },
+            opset_version=opset
+        )
+
+    print("📤 Exporting recognizer...", file=sys.stderr)
+    with torch.no_grad():
+        torch.onnx.export(
+            _export_recognizer_module(reader.recognizer.eval()),
+            torch.randn(1, 1, RECOGNIZER_HEIGHT, 256), recognizer_path,
+            input_names=["image"], output_names=["logits"],
+            dynamic_axes={"image": {0: "batch", 3: "width"}, "logits": {0: "batch", 1: "steps"}},
+            opset_version=opset
+        )
+
+    written = [detector_path, recognizer_path]
+    if quantize != "none":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # The recognizer is LSTM/MatMul heavy and gains the most; int8 convolutions
+        # (ConvInteger) are often no faster than fp32 on CPU, so the detector is opt-in
+        names = [onnx_ocr.RECOGNIZER_NAME] if quantize == "recognizer" else [onnx_ocr.DETECTOR_NAME, onnx_ocr.RECOGNIZER_NAME]
+        for name in names:
+            source = onnx_ocr.graph_path(model_dir, name)
+            target = onnx_ocr.graph_path(model_dir, name, quantized=True)
+            print(f"🗜️  Quantizing {os.path.basename(source)} to int8...", file=sys.stderr)
+            quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+            written.append(target)
+
+    for path in written:
+        print(f"✅ {path} ({os.path.getsize(path) / 1e6:.1f} MB)", file=sys.stderr)
+
+
+def _reader_text(reader, image):
+    """Text the way extract_text_ocr keeps it (top to bottom, prob > 0.4)"""
+    results = reader.readtext(image, detail=1, paragraph=False, min_size=10, text_threshold=0.7,
+                              low_text=0.4, link_threshold=0.4, canvas_size=2560, mag_ratio=1.0)
+    ordered = sorted(results, key=lambda x: x[0][0][1])
+    return "\n".join(text for _, text, prob in ordered if prob > 0.4)
+
+
+def check(directory, model_dir, quantized, threads, limit, min_similarity):
+    """Compare ONNX Runtime OCR against the PyTorch reader; True if agreement is good enough"""
+    import easyocr
+    from benchmark import find_banners
+    from image_io import decode_image
+    from preprocessing import PreprocessPipeline
+
+    models = onnx_ocr.find_models(model_dir, quantized)
+    if models is None:
+        print(f"❌ No exported graphs in {model_dir} - run: python onnx_export.py export", file=sys.stderr)
+        return False
+
+    # Reference: the production PyTorch path (EasyOCR's CPU defaults)
+    torch_reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+    onnx_reader = onnx_ocr.attach(easyocr.Reader(['en'], gpu=False, quantize=False, verbose=False), *models, threads=threads)
+
+    rows = []
+    for path in find_banners(directory, limit):
+        img = decode_image(path, max_size=2048)
+        if img is None:
+            continue
+        # Same input the detector sees in production
+        image = PreprocessPipeline(img)["high_contrast"]
+        timings = {}
+        texts = {}
+        for name, reader in (("torch", torch_reader), ("onnx", onnx_reader)):
+            _reader_text(reader, image)  # First call per shape pays one-off allocation
+            start = time.perf_counter()
+            texts[name] = _reader_text(reader, image)
+            timings[name] = time.perf_counter() - start
+        similarity = difflib.SequenceMatcher(None, texts["torch"], texts["onnx"]).ratio()
+        rows.append({"image": os.path.basename(path), "similarity": similarity, **{f"{k}_seconds": v for k, v in timings.items()}})
+        print(f"{os.path.basename(path):<44}{similarity:>8.3f}{timings['torch']:>8.2f}s{timings['onnx']:>8.2f}s", file=sys.stderr)
+
+    if not rows:
+        print(f"❌ No banners found in {directory}", file=sys.stderr)
+        return False
+    summary = {
+        "graphs": [os.path.basename(p) for p in models],
+        "images": len(rows),
+        "mean_similarity": statistics.mean(r["similarity"] for r in rows),
+        "min_similarity": min(r["similarity"] for r in rows),
+        "torch_p50_seconds": statistics.median(r["torch_seconds"] for r in rows),
+        "onnx_p50_seconds": statistics.median(r["onnx_seconds"] for r in rows)
+    }
+    summary["speedup"] = summary["torch_p50_seconds"] / summary["onnx_p50_seconds"]
+    print(json.dumps({"summary": summary, "images": rows}, indent=2))
+
+    ok = summary["mean_similarity"] >= min_similarity
+    print(f"{'✅' if ok else '❌'} Mean text similarity {summary['mean_similarity']:.3f} "
+          f"(threshold {min_similarity}), {summary['speedup']:.1f}x faster", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export EasyOCR to ONNX and check it against PyTorch")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="Write ONNX graphs (and int8 versions)")
+    export_parser.add_argument("--model-dir", default=onnx_ocr.MODEL_DIR)
+    export_parser.add_argument("--quantize", default="recognizer", choices=["none", "recognizer", "all"],
+                               help="Which graphs get an int8 dynamically quantized copy (default: recognizer)")
+    export_parser.add_argument("--opset", type=int, default=17)
+
+    check_parser = sub.add_parser("check", help="Compare ONNX Runtime OCR with PyTorch on a corpus")
+    check_parser.add_argument("directory", help="Directory of banner images")
+    check_parser.add_argument("--model-dir", default=onnx_ocr.MODEL_DIR)
+    check_parser.add_argument("--fp32", action="store_true", help="Check the fp32 graphs even if int8 ones exist")
+    check_parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = all cores)")
+    check_parser.add_argument("--limit", type=int, help="Only use the first N banners")
+    check_parser.add_argument("--min-similarity", type=float, default=0.95,
+                              help="Mean text similarity (0-1) below which the check fails")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.model_dir, args.quantize, args.opset)
+    elif not check(args.directory, args.model_dir, not args.fp32, args.threads, args.limit, args.min_similarity):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+ONNX Runtime stand-ins for EasyOCR's PyTorch detector and recognizer
+EasyOCR keeps doing all pre- and post-processing (resizing, CRAFT box
+extraction, CTC decoding); only the two network forward passes move to
+ONNX Runtime. Graphs are produced by onnx_export.py
+"""
+import os
+import sys
+from importlib.util import find_spec
+
+import numpy as np
+
+ONNXRUNTIME_AVAILABLE = find_spec("onnxruntime") is not None
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+DETECTOR_NAME = "craft_detector"
+RECOGNIZER_NAME = "english_g2_recognizer"
+
+
+def graph_path(model_dir, name, quantized=False):
+    return os.path.join(model_dir, f"{name}.int8.onnx" if quantized else f"{name}.onnx")
+
+
+def find_models(model_dir=MODEL_DIR, quantized=True):
+    """(detector, recognizer) graph paths, preferring int8 ones when quantized; None if not exported"""
+    paths = []
+    for name in (DETECTOR_NAME, RECOGNIZER_NAME):
+        candidates = [graph_path(model_dir, name, True)] if quantized else []
+        candidates.append(graph_path(model_dir, name))
+        path = next((p for p in candidates if os.path.exists(p)), None)
+        if path is None:
+            return None
+        paths.append(path)
+    return tuple(paths)
+
+
+def create_session(path, threads=0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        # Keep worker processes from each claiming every core
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxModule:
+    """The slice of the torch.nn.Module interface EasyOCR calls: eval() and forward"""
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def _run(self, tensor):
+        array = tensor.detach().cpu().numpy().astype(np.float32, copy=False)
+        return self.session.run(None, {self.input_name: array})
+
+
+class OnnxDetector(OnnxModule):
+    def __call__(self, x):
+        import torch
+        scores, feature = self._run(x)
+        return torch.from_numpy(scores), torch.from_numpy(feature)
+
+
+class OnnxRecognizer(OnnxModule):
+    def __call__(self, image, text=None):
+        # text only matters for attention decoders; english_g2 is CTC
+        import torch
+        return torch.from_numpy(self._run(image)[0])
+
+
+def attach(reader, detector_path, recognizer_path, threads=0):
+    """Swap an easyocr.Reader's torch networks for ONNX Runtime sessions"""
+    reader.detector = OnnxDetector(create_session(detector_path, threads))
+    reader.recognizer = OnnxRecognizer(create_session(recognizer_path, threads))
+    print(f"⚙️  ONNX Runtime OCR: {os.path.basename(detector_path)} + {os.path.basename(recognizer_path)}", file=sys.stderr)
+    return reader
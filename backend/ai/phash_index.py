@@ -0,0 +1,229 @@
+"""
+Perceptual-hash index of analyzed banners
+Finds resized, recompressed or screenshotted copies of a banner that was
+already analyzed, using a BK-tree over the Hamming distance of 64-bit hashes.
+A near-identical hash is answered before OCR; banners made from one template
+hash only a few bits apart, so a farther match is only a candidate, confirmed
+by comparing the OCR text of both banners
+"""
+import copy
+import difflib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def _gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def phash(img):
+    """64-bit DCT hash: robust to scaling, recompression and mild colour changes"""
+    small = cv2.resize(_gray(img), (32, 32), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(np.float32(small))[:8, :8].flatten()
+    # The DC term is overall brightness and would dominate the median
+    bits = low > np.median(low[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def dhash(img):
+    """64-bit gradient hash: cheaper than phash, a little less robust"""
+    small = cv2.resize(_gray(img), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+HASHES = {"phash": phash, "dhash": dhash}
+
+# Copies of one banner are within TRUST_DISTANCE bits and answered without OCR;
+# a template reused with another date/time can be a few bits away, so matches up
+# to MAX_DISTANCE are only candidates until their OCR text agrees
+TRUST_DISTANCE = 2
+MAX_DISTANCE = 6
+# OCR of two copies of one banner differs a little; their numbers must not
+MIN_TEXT_SIMILARITY = 0.9
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def same_text(a, b, min_similarity=MIN_TEXT_SIMILARITY):
+    """Whether two OCR texts read the same banner: identical numbers (dates,
+    times, phones, fees) and mostly the same words"""
+    a, b = _normalize(a or ""), _normalize(b or "")
+    if not a or not b or re.findall(r"\d+", a) != re.findall(r"\d+", b):
+        return False
+    return difflib.SequenceMatcher(None, a, b).ratio() >= min_similarity
+
+
+class BKTree:
+    """Metric tree for Hamming distance; a search only visits subtrees that can match"""
+
+    def __init__(self):
+        self._root = None  # [hash, [items], {distance: child}]
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """[(distance, item)] for every item within max_distance, closest first"""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            # Triangle inequality: only children at distance +- max_distance can match
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class PHashIndex:
+    def __init__(self, path=None, max_distance=MAX_DISTANCE, method="phash", min_text_similarity=MIN_TEXT_SIMILARITY,
+                 trust_distance=TRUST_DISTANCE):
+        """Initialize index
+
+        Args:
+            path: JSON-lines file entries are appended to (None = in-memory only).
+                  Several processes can share it; each picks up the others' lines.
+            max_distance: Largest Hamming distance (of 64 bits) for a candidate duplicate
+            method: 'phash' or 'dhash'
+            min_text_similarity: OCR text similarity (0-1) that confirms a candidate
+            trust_distance: Largest distance answered without OCR (-1 = always confirm by text)
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.method = method
+        self.min_text_similarity = min_text_similarity
+        self.trust_distance = trust_distance
+        self._hash = HASHES[method]
+        self._tree = BKTree()
+        self._offset = 0  # Bytes of path already loaded
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # Hash matched, text didn't
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._lock:
+                self._sync()
+            print(f"🖼️  Perceptual hash index: {self._tree.size} banners ({self.path})", file=sys.stderr)
+
+    def hash(self, img):
+        return self._hash(img)
+
+    def find(self, value, config_key):
+        """Stored (event_data, distance, ocr_text) candidates for the same analyzer config, closest first"""
+        with self._lock:
+            self._sync()
+            candidates = [
+                (copy.deepcopy(event_data), distance, ocr_text)
+                for distance, (key, event_data, ocr_text) in self._tree.search(value, self.max_distance)
+                # Entries from before OCR text was stored can never be confirmed
+                if key == config_key and ocr_text
+            ]
+            if not candidates:
+                self.misses += 1
+        return candidates
+
+    def confirm(self, candidates, ocr_text=None):
+        """(event_data, distance) of the first candidate whose OCR text matches ocr_text, or None
+
+        Before OCR (ocr_text None) only a candidate within trust_distance matches.
+        """
+        for event_data, distance, stored_text in candidates:
+            if ocr_text is None:
+                matched = distance <= self.trust_distance
+            else:
+                matched = same_text(stored_text, ocr_text, self.min_text_similarity)
+            if matched:
+                with self._lock:
+                    self.hits += 1
+                return event_data, distance
+        if candidates and ocr_text is not None:
+            with self._lock:
+                self.rejected += 1
+        return None
+
+    def add(self, value, config_key, event_data, ocr_text):
+        entry = {"hash": f"{value:016x}", "config": config_key, "stored_at": time.time(),
+                 "event_data": event_data, "ocr_text": ocr_text}
+        with self._lock:
+            if not self.path:
+                self._tree.add(value, (config_key, copy.deepcopy(event_data), ocr_text))
+                return
+            try:
+                # One append per entry: lines from concurrent writers don't interleave
+                with open(self.path, 'ab') as f:
+                    f.write((json.dumps(entry) + "\n").encode('utf-8'))
+            except Exception as e:
+                print(f"⚠️  Could not save perceptual hash: {e}", file=sys.stderr)
+                return
+            # Reads our line back along with anything other processes appended
+            self._sync()
+
+    def _sync(self):
+        """Load lines appended since the last read (caller holds the lock)"""
+        if not self.path:
+            return
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Still being written - pick it up next time
+                    self._offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                        self._tree.add(int(entry["hash"], 16), (entry["config"], entry["event_data"], entry.get("ocr_text")))
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️  Could not load perceptual hash index: {e}", file=sys.stderr)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": self._tree.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "max_distance": self.max_distance,
+                "trust_distance": self.trust_distance,
+                "method": self.method
+            }
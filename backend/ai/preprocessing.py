@@ -0,0 +1,164 @@
+"""
+Lazy, cost-aware OCR preprocessing pipeline
+Variants are built on demand from shared intermediates (downscaled base, grayscale)
+"""
+import threading
+import time
+from collections.abc import Mapping
+
+import cv2
+import numpy as np
+
+from text_regions import crop
+
+# Operators reused across requests instead of being rebuilt per call
+SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+_local = threading.local()
+
+
+def get_clahe():
+    """CLAHE operator, built once per thread (cv2 objects are not thread-safe)"""
+    clahe = getattr(_local, 'clahe', None)
+    if clahe is None:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        _local.clahe = clahe
+    return clahe
+
+
+def _high_contrast(gray):
+    # Good for low-contrast text
+    return get_clahe().apply(gray)
+
+
+def _adaptive_thresh(gray):
+    # Good for varied backgrounds
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2
+    )
+
+
+def _denoised_sharp(gray):
+    # Good for noisy images (fastNlMeansDenoising is by far the slowest step)
+    denoised = cv2.fastNlMeansDenoising(gray)
+    return cv2.filter2D(denoised, -1, SHARPEN_KERNEL)
+
+
+def _bilateral(gray):
+    # Preserves edges, reduces noise
+    return cv2.bilateralFilter(gray, 9, 75, 75)
+
+
+def _original_otsu(gray):
+    # Baseline
+    _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return otsu
+
+
+VARIANT_BUILDERS = {
+    'high_contrast': _high_contrast,
+    'adaptive_thresh': _adaptive_thresh,
+    'denoised_sharp': _denoised_sharp,
+    'bilateral': _bilateral,
+    'original_otsu': _original_otsu,
+}
+
+
+class VariantCosts:
+    """Process-wide moving average of variant build time, in seconds per megapixel"""
+
+    # Rough priors so the order is sensible before anything has been measured
+    DEFAULT_COSTS = {
+        'original_otsu': 0.002,
+        'adaptive_thresh': 0.004,
+        'high_contrast': 0.005,
+        'bilateral': 0.05,
+        'denoised_sharp': 0.5,
+    }
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._costs = dict(self.DEFAULT_COSTS)
+        self._lock = threading.Lock()
+
+    def estimate(self, name, megapixels):
+        with self._lock:
+            return self._costs.get(name, 0.01) * megapixels
+
+    def observe(self, name, seconds, megapixels):
+        if megapixels <= 0:
+            return
+        per_mp = seconds / megapixels
+        with self._lock:
+            previous = self._costs.get(name)
+            self._costs[name] = per_mp if previous is None else (1 - self.alpha) * previous + self.alpha * per_mp
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._costs)
+
+
+VARIANT_COSTS = VariantCosts()
+
+
+class PreprocessPipeline(Mapping):
+    """Read-only mapping of strategy name -> preprocessed image, built lazily
+
+    Iteration yields the cheapest variants first. Variants are not kept after
+    they are returned, so only the grayscale base stays alive per request.
+    """
+
+    def __init__(self, image, max_size=2048, costs=VARIANT_COSTS):
+        self._image = image
+        self.max_size = max_size
+        self.costs = costs
+        self._gray = None
+        self._lock = threading.Lock()
+
+    @property
+    def gray(self):
+        """Downscaled grayscale base shared by every variant"""
+        with self._lock:
+            if self._gray is None:
+                img = self._image
+                # Resize if too large (to avoid OOM and speed up processing)
+                height, width = img.shape[:2]
+                if max(height, width) > self.max_size:
+                    scale = self.max_size / max(height, width)
+                    img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_LANCZOS4)
+                self._gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                self._image = None  # Only the grayscale base is needed from here on
+            return self._gray
+
+    def crop(self, box):
+        """Restrict the grayscale base (and so every variant) to box = (x0, y0, x1, y1)"""
+        gray = self.gray
+        with self._lock:
+            self._gray = crop(gray, box)
+
+    @property
+    def megapixels(self):
+        height, width = self.gray.shape[:2]
+        return height * width / 1e6
+
+    def cost(self, name):
+        """Estimated seconds to build a variant for this image"""
+        return self.costs.estimate(name, self.megapixels)
+
+    def __getitem__(self, name):
+        builder = VARIANT_BUILDERS[name]
+        gray = self.gray
+        start = time.perf_counter()
+        variant = builder(gray)
+        self.costs.observe(name, time.perf_counter() - start, self.megapixels)
+        return variant
+
+    def __contains__(self, name):
+        # Mapping's default would build the variant just to test membership
+        return name in VARIANT_BUILDERS
+
+    def __iter__(self):
+        return iter(sorted(VARIANT_BUILDERS, key=self.cost))
+
+    def __len__(self):
+        return len(VARIANT_BUILDERS)
@@ -0,0 +1,119 @@
+"""
+Content-addressed cache for banner analysis results
+In-memory LRU tier with size/TTL eviction, plus an optional on-disk tier
+"""
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, ttl=24 * 3600, disk_dir=None):
+        """Initialize cache
+
+        Args:
+            max_entries: Results kept in memory before least-recently-used are evicted
+            ttl: Seconds a result stays valid (both tiers)
+            disk_dir: Directory for the persistent tier (None disables it)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()  # key -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_digest, config):
+        """Combine the image hash with the analyzer settings that affect output"""
+        hasher = hashlib.sha256()
+        hasher.update(image_digest.encode())
+        hasher.update(json.dumps(config, sort_keys=True).encode())
+        return hasher.hexdigest()
+
+    def get(self, key):
+        """Return a copy of the cached result, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            if entry:
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry and now - entry[0] <= self.ttl:
+                self._store_memory(key, entry)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        entry = (time.time(), copy.deepcopy(result))
+        with self._lock:
+            self._store_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def _store_memory(self, key, entry):
+        """Insert and evict down to max_entries (caller holds the lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if time.time() - data["stored_at"] > self.ttl:
+                os.unlink(path)
+                return None
+            return data["stored_at"], data["result"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Cache read failed for {key[:12]}: {e}", file=sys.stderr)
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"stored_at": entry[0], "result": entry[1]}, f)
+            os.replace(tmp_path, path)  # Atomic so readers never see partial files
+        except Exception as e:
+            print(f"⚠️  Cache write failed for {key[:12]}: {e}", file=sys.stderr)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "disk": bool(self.disk_dir)
+            }
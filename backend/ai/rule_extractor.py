@@ -0,0 +1,224 @@
+"""
+Deterministic event extraction from OCR text
+Regexes and dateutil fill the fields that banners usually label plainly
+("Date:", "Venue:", emails, phones, fees) so the LLM only sees what is left
+"""
+import re
+from datetime import datetime
+
+from dateutil import parser as date_parser
+
+# Fields the result is judged complete on - the rest are nice to have
+CORE_FIELDS = ("title", "event_date", "event_time", "venue_name")
+
+CATEGORY_KEYWORDS = {
+    "workshop": ("workshop", "hands-on", "bootcamp", "masterclass"),
+    "seminar": ("seminar", "webinar", "talk", "lecture", "guest session"),
+    "competition": ("competition", "contest", "hackathon", "challenge", "quiz", "tournament"),
+    "conference": ("conference", "summit", "symposium", "conclave"),
+    "cultural": ("cultural", "fest", "festival", "concert", "music", "dance", "drama"),
+    "sports": ("sports", "marathon", "cricket", "football", "match", "athletic"),
+    "social": ("meetup", "networking", "party", "social", "get-together"),
+    "academic": ("academic", "orientation", "convocation", "research", "admission"),
+}
+
+LABELS = {
+    "event_date": ("date", "event date"),
+    "event_time": ("time", "timing", "timings"),
+    "venue_name": ("venue", "location", "place", "where"),
+    "venue_address": ("address",),
+    "entry_fee": ("entry fee", "registration fee", "fee", "fees", "entry", "price", "tickets"),
+    "organizer": ("organized by", "organised by", "presented by", "hosted by", "organizer", "organiser"),
+    "registration_deadline": ("deadline", "last date", "register by", "registration deadline", "registration closes"),
+    "contact_phone": ("contact", "phone", "call", "mobile", "whatsapp"),
+}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?<![\w])\+?\d[\d\s().-]{7,}\d(?![\w])")
+# After a phone label the number can be shorter (landlines, extensions) and
+# have OCR letters for digits (O for 0, I/l for 1)
+LABELLED_PHONE_RE = re.compile(r"(?<![\w])\+?[\dOIl][\dOIl\s().-]{4,}[\dOIl](?![\w])")
+OCR_DIGITS = str.maketrans("OIl", "011")
+MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+DATE_RES = (
+    re.compile(rf"\b\d{{1,2}}(?:st|nd|rd|th)?\s*(?:of\s+)?{MONTHS},?\s*\d{{4}}\b", re.I),  # 28th December 2025
+    re.compile(rf"\b{MONTHS}\s*\d{{1,2}}(?:st|nd|rd|th)?,?\s*\d{{4}}\b", re.I),  # December 28, 2025
+    re.compile(r"\b\d{4}-\d{1,2}-\d{1,2}\b"),  # 2025-12-28
+    re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b"),  # 28/12/2025
+)
+TIME_RE = re.compile(r"\b(\d{1,2})(?:[:.](\d{2}))?\s*([ap])\.?\s*m\b\.?|\b([01]?\d|2[0-3]):([0-5]\d)\b", re.I)
+AMOUNT_RE = re.compile(r"(?:৳|₹|tk\.?|bdt|rs\.?|inr|\$|usd)?\s*(\d+(?:[.,]\d+)?)\s*(?:/-|tk|taka|bdt|rs|only)?", re.I)
+FREE_RE = re.compile(r"\b(?:free|no\s+(?:entry\s+)?fee|no\s+charge)\b", re.I)
+VENUE_RE = re.compile(
+    r"\b(?:hall|auditorium|centre|center|campus|stadium|ground|arena|theatre|theater|"
+    r"room|block|building|hotel|convention|lab|library|park|club)\b", re.I
+)
+
+
+def _split_label(line, labels):
+    """Value after one of labels ("Venue: X", "Venue - X"), '' for a bare label, else None"""
+    lowered = line.lower()
+    for label in sorted(labels, key=len, reverse=True):
+        if lowered.startswith(label):
+            rest = line[len(label):]
+            if not rest.strip():
+                return ""
+            if rest[0] in ":-–|" or (label.endswith("by") and rest[0] == " "):
+                return rest.lstrip(" :-–|").strip()
+    return None
+
+
+def _labelled(lines, field):
+    """Value of a labelled line, taking the next line when OCR split label and value"""
+    for index, line in enumerate(lines):
+        value = _split_label(line, LABELS[field])
+        if value is None:
+            continue
+        if not value and index + 1 < len(lines):
+            value = lines[index + 1]
+        if value:
+            return value
+    return None
+
+
+def parse_date(text):
+    """First explicit date in text as YYYY-MM-DD, or None"""
+    for pattern in DATE_RES:
+        match = pattern.search(text)
+        if not match:
+            continue
+        value = match.group(0)
+        try:
+            # Numeric dates on these banners are day-first (28/12/2025)
+            dayfirst = not re.match(r"\d{4}-", value)
+            return date_parser.parse(value, dayfirst=dayfirst, fuzzy=True).strftime("%Y-%m-%d")
+        except (ValueError, OverflowError):
+            continue
+    return None
+
+
+def parse_time(text):
+    """First time in text as 24-hour HH:MM, or None"""
+    match = TIME_RE.search(text)
+    if not match:
+        return None
+    if match.group(3):
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            return None
+        hour = hour % 12 + (12 if match.group(3).lower() == "p" else 0)
+    else:
+        hour, minute = int(match.group(4)), int(match.group(5))
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_fee(text):
+    """Fee amount as a string ("0" for free), or None"""
+    if FREE_RE.search(text):
+        return "0"
+    match = AMOUNT_RE.search(text)
+    if match:
+        return match.group(1).replace(",", "")
+    return None
+
+
+def _phone(lines, text):
+    """Number on a labelled line ("Call: 8123456"), else any phone-shaped number"""
+    for index, line in enumerate(lines):
+        value = _split_label(line, LABELS["contact_phone"])
+        if value == "" and index + 1 < len(lines):
+            value = lines[index + 1]  # OCR split label and number
+        for match in LABELLED_PHONE_RE.finditer(value or ""):
+            number = " ".join(match.group(0).translate(OCR_DIGITS).split())
+            # Mostly real digits, so a word like "Ill" isn't read as a number
+            if sum(c.isdigit() for c in match.group(0)) >= 4 and 6 <= len(re.sub(r"\D", "", number)) <= 13:
+                return number
+    for match in PHONE_RE.finditer(text):
+        digits = re.sub(r"\D", "", match.group(0))
+        if 10 <= len(digits) <= 13:
+            return " ".join(match.group(0).split())
+    return None
+
+
+def _title(lines):
+    """First line that looks like a heading rather than a label or contact detail"""
+    all_labels = [label for labels in LABELS.values() for label in labels]
+    for line in lines[:5]:
+        if _split_label(line, all_labels) is not None:
+            continue
+        if EMAIL_RE.search(line) or parse_date(line) or parse_time(line):
+            continue
+        if sum(c.isalpha() for c in line) >= 4:
+            return line
+    return None
+
+
+def _category(text):
+    lowered = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(re.search(rf"\b{re.escape(k)}\b", lowered) for k in keywords):
+            return category
+    return None
+
+
+def extract_fields(ocr_text):
+    """Fields that could be read deterministically from OCR text
+
+    Only fields that were actually found are returned, in the same shape the
+    LLM produces (dates YYYY-MM-DD, time HH:MM, fee as a string).
+    """
+    lines = [line.strip() for line in ocr_text.split("\n") if line.strip()]
+    text = "\n".join(lines)
+    fields = {}
+
+    fields["title"] = _title(lines)
+
+    date_line = _labelled(lines, "event_date")
+    fields["event_date"] = parse_date(date_line) if date_line else None
+    deadline_line = _labelled(lines, "registration_deadline")
+    fields["registration_deadline"] = parse_date(deadline_line) if deadline_line else None
+    if not fields["event_date"]:
+        # An unlabelled date is the event date unless it is the deadline
+        date = parse_date(text)
+        if date and date != fields["registration_deadline"]:
+            fields["event_date"] = date
+
+    time_line = _labelled(lines, "event_time")
+    fields["event_time"] = parse_time(time_line) if time_line else parse_time(text)
+
+    venue = _labelled(lines, "venue_name")
+    if not venue:
+        venue = next((line for line in lines if VENUE_RE.search(line) and line != fields["title"]), None)
+    fields["venue_name"] = venue
+    fields["venue_address"] = _labelled(lines, "venue_address")
+    fields["organizer"] = _labelled(lines, "organizer")
+
+    email = EMAIL_RE.search(text)
+    fields["contact_email"] = email.group(0) if email else None
+    fields["contact_phone"] = _phone(lines, text)
+
+    fee_line = _labelled(lines, "entry_fee")
+    fields["entry_fee"] = parse_fee(fee_line) if fee_line else ("0" if FREE_RE.search(text) else None)
+
+    fields["category"] = _category(text)
+
+    return {name: value for name, value in fields.items() if value}
+
+
+def completeness(fields):
+    """Share of CORE_FIELDS filled (0-1)"""
+    return sum(1 for name in CORE_FIELDS if fields.get(name)) / len(CORE_FIELDS)
+
+
+def missing_fields(fields, wanted):
+    """Names from wanted that extract_fields did not fill"""
+    return [name for name in wanted if not fields.get(name)]
+
+
+def is_complete(fields, threshold=1.0):
+    """True when the core fields are filled well enough to skip the LLM"""
+    if completeness(fields) < threshold:
+        return False
+    # A date that already passed long ago is more likely an OCR misread than a real event
+    date = fields.get("event_date")
+    return not date or date[:4] >= str(datetime.now().year - 1)
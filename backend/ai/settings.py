@@ -0,0 +1,63 @@
+"""
+Analyzer settings read from AI_* / OLLAMA_* environment variables
+Shared by the API server and the bulk CLI so both analyze banners the same way
+"""
+import os
+
+from llm_router import parse_hosts
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def phash_config():
+    """Perceptual hash index settings; off unless AI_PHASH_INDEX names a file"""
+    path = os.environ.get("AI_PHASH_INDEX", "")
+    if not path:
+        return None
+    return {
+        "path": path,
+        "max_distance": int(os.environ.get("AI_PHASH_MAX_DISTANCE", "6")),
+        "trust_distance": int(os.environ.get("AI_PHASH_TRUST_DISTANCE", "2")),
+        "min_text_similarity": float(os.environ.get("AI_PHASH_MIN_TEXT_SIMILARITY", "0.9"))
+    }
+
+
+def analyzer_config():
+    """Analyzer settings from the environment (shared with worker processes)"""
+    return {
+        "ocr_backend": os.environ.get("AI_OCR_BACKEND", "easy"),
+        "ocr_mode": os.environ.get("AI_OCR_MODE", "two_stage"),
+        "adaptive_canvas": os.environ.get("AI_OCR_ADAPTIVE", "1") != "0",
+        "tile_threshold": int(os.environ.get("AI_OCR_TILE_THRESHOLD", "3072")),
+        "tile_workers": int(os.environ.get("AI_OCR_TILE_WORKERS", "2")),
+        "scheduler": {
+            "min_confidence": float(os.environ.get("AI_OCR_MIN_CONFIDENCE", "0.85")),
+            "min_chars": int(os.environ.get("AI_OCR_MIN_CHARS", "40")),
+            "time_budget": float(os.environ["AI_OCR_TIME_BUDGET"]) if os.environ.get("AI_OCR_TIME_BUDGET") else None,
+            "stats_path": os.environ.get("AI_STRATEGY_STATS", os.path.join(AI_DIR, "strategy_stats.json"))
+        },
+        "onnx": {
+            "model_dir": os.environ.get("AI_ONNX_MODEL_DIR") or None,
+            "quantized": os.environ.get("AI_ONNX_QUANTIZED", "1") != "0",
+            "threads": int(os.environ.get("AI_ONNX_THREADS", "0"))
+        },
+        "rules_min_completeness": float(os.environ.get("AI_RULES_MIN_COMPLETENESS", "1.0")),
+        "phash": phash_config(),
+        "structuring": {
+            # 'legacy' restores the original unbounded free-form prompt
+            "mode": os.environ.get("AI_LLM_PROMPT", "schema"),
+            "ocr_tokens": int(os.environ.get("AI_LLM_OCR_TOKENS", "600")),
+            "num_predict": int(os.environ.get("AI_LLM_NUM_PREDICT", "384"))
+        },
+        "llm": {
+            "host": os.environ.get("OLLAMA_HOST") or None,
+            # Several hosts: calls are load balanced across them (see llm_router.py)
+            "hosts": parse_hosts(os.environ.get("OLLAMA_HOSTS")),
+            "hedge": os.environ.get("OLLAMA_HEDGE", "1") != "0",
+            "max_failures": int(os.environ.get("OLLAMA_MAX_FAILURES", "3")),
+            "eject_seconds": float(os.environ.get("OLLAMA_EJECT_SECONDS", "30")),
+            "timeout": float(os.environ.get("OLLAMA_TIMEOUT", "120")),
+            "keep_alive": os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+            "refresh_interval": float(os.environ.get("OLLAMA_REFRESH_INTERVAL", "300"))
+        }
+    }
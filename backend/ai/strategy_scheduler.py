@@ -0,0 +1,172 @@
+"""
+Adaptive scheduler for OCR preprocessing strategies
+Orders strategies by historical win rate and decides when OCR can stop early
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Seconds between merges of this process's counts into stats_path
+SAVE_INTERVAL = 30.0
+
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path (a sidecar lock file) across processes"""
+    with open(path, 'a+b') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StrategyScheduler:
+    def __init__(self, min_confidence=0.85, min_chars=40, time_budget=None, stats_path=None,
+                 save_interval=SAVE_INTERVAL):
+        """Initialize scheduler
+
+        Args:
+            min_confidence: Average OCR confidence (0-1) that ends the search early
+            min_chars: Minimum extracted characters required alongside min_confidence
+            time_budget: Default seconds per request before no new strategy is started (None = unlimited)
+            stats_path: JSON file the win/trial counts are persisted to (None = in-memory only).
+                        Several processes can share it: each merges its own counts
+                        under a file lock at most every save_interval seconds
+            save_interval: Seconds between merges into stats_path (flush() forces one)
+        """
+        self.min_confidence = min_confidence
+        self.min_chars = min_chars
+        self.time_budget = time_budget
+        self.stats_path = stats_path
+        self.save_interval = save_interval
+        self._last_save = time.time()
+        self._stats = {}  # strategy -> {"wins": int, "trials": int}
+        self._pending = {}  # Counts not yet merged into stats_path
+        self._ocr_seconds = 1.0  # Moving average of one OCR pass, used to weigh preprocessing cost
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stats = self._read_file()
+
+    def win_rate(self, strategy):
+        """Laplace-smoothed wins/trials so untried strategies still get a chance"""
+        entry = self._stats.get(strategy, {"wins": 0, "trials": 0})
+        return (entry["wins"] + 1) / (entry["trials"] + 2)
+
+    def order(self, strategies, costs=None):
+        """Return strategies best first (stable for ties)
+
+        Without costs this is plain win rate. With costs (estimated preprocessing
+        seconds per strategy) strategies are ranked by expected wins per second
+        of preprocessing + OCR, so cheap variants go first unless they rarely win.
+        """
+        strategies = list(strategies)
+        with self._lock:
+            rates = {name: self.win_rate(name) for name in strategies}
+            ocr_seconds = self._ocr_seconds
+        if costs:
+            return sorted(strategies, key=lambda name: -rates[name] / (ocr_seconds + costs.get(name, 0.0)))
+        return sorted(strategies, key=lambda name: -rates[name])
+
+    def observe_ocr_time(self, seconds, alpha=0.2):
+        """Update the moving average duration of a single OCR pass"""
+        with self._lock:
+            self._ocr_seconds = (1 - alpha) * self._ocr_seconds + alpha * seconds
+
+    def is_good_enough(self, confidence, text):
+        """True when a single strategy's result makes trying the rest pointless"""
+        return confidence >= self.min_confidence and len(text.strip()) >= self.min_chars
+
+    def record(self, winner, tried):
+        """Count a trial for every strategy that ran and a win for the best one"""
+        with self._lock:
+            for counts in (self._stats, self._pending):
+                for name in tried:
+                    entry = counts.setdefault(name, {"wins": 0, "trials": 0})
+                    entry["trials"] += 1
+                    if name == winner:
+                        entry["wins"] += 1
+            due = time.time() - self._last_save >= self.save_interval
+        if due:
+            self._save()
+
+    def flush(self):
+        """Merge counts not yet saved into stats_path (call before exiting)"""
+        with self._lock:
+            pending = bool(self._pending)
+        if pending:
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(entry, win_rate=round(self.win_rate(name), 3))
+                for name, entry in self._stats.items()
+            }
+
+    def _read_file(self):
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return {}
+        try:
+            with open(self.stats_path, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️  Could not load strategy stats: {e}", file=sys.stderr)
+            return {}
+
+    def _save(self):
+        """Merge pending counts into the file, so several processes can share it
+        
+        Read, merge and replace happen under a file lock: without it two
+        processes merging at once would each drop the other's counts.
+        """
+        if not self.stats_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                pending = json.loads(json.dumps(self._pending))
+                self._last_save = time.time()
+            try:
+                with _file_lock(f"{self.stats_path}.lock"):
+                    merged = self._read_file()
+                    for name, delta in pending.items():
+                        entry = merged.setdefault(name, {"wins": 0, "trials": 0})
+                        entry["wins"] += delta["wins"]
+                        entry["trials"] += delta["trials"]
+                    tmp_path = f"{self.stats_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(merged, f, indent=2)
+                    os.replace(tmp_path, self.stats_path)
+            except Exception as e:
+                print(f"⚠️  Could not save strategy stats: {e}", file=sys.stderr)
+                return
+            with self._lock:
+                # Counts recorded while we were writing stay pending for next time
+                for name, delta in pending.items():
+                    entry = self._pending[name]
+                    entry["wins"] -= delta["wins"]
+                    entry["trials"] -= delta["trials"]
+                    if not entry["trials"]:
+                        del self._pending[name]
+                for name, entry in self._pending.items():
+                    current = merged.setdefault(name, {"wins": 0, "trials": 0})
+                    current["wins"] += entry["wins"]
+                    current["trials"] += entry["trials"]
+                self._stats = merged
@@ -0,0 +1,36 @@
+"""
+Tests for image_io's header checks on oversized images
+
+Run from backend/ai: python -m pytest -q test_image_io.py
+"""
+import struct
+import zlib
+
+import pytest
+
+import image_io
+
+
+def png_header(width, height):
+    """A PNG that declares width x height but carries one row of pixels"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\0" * (width + 1))) + chunk(b"IEND", b"")
+
+
+def test_header_size_is_read_without_decoding():
+    assert image_io.image_dimensions(png_header(8000, 6000)) == (8000, 6000)
+
+
+def test_decompression_bomb_is_too_large():
+    with pytest.raises(image_io.ImageTooLarge):
+        image_io.image_dimensions(png_header(20000, 10000))
+
+
+def test_unreadable_header_is_none():
+    assert image_io.image_dimensions(b"not an image") is None
+
+
+def test_decode_refuses_a_decompression_bomb():
+    assert image_io.decode_image(png_header(20000, 10000)) is None
@@ -0,0 +1,76 @@
+"""
+Tests for llm_prompt's reply repair and OCR text budgeting
+
+Run from backend/ai: python -m pytest -q test_llm_prompt.py
+"""
+import json
+
+import llm_prompt
+
+REPLY = json.dumps({
+    "title": "Tech Fest",
+    "venue_name": "Main Hall",
+    "event_date": "2025-12-28",
+    "tags": ["tech", "fest"]
+})
+
+
+def cut_inside(value):
+    """The reply cut off three characters into value"""
+    return REPLY[:REPLY.index(json.dumps(value)) + 4]
+
+
+def test_complete_reply_is_not_repaired():
+    assert llm_prompt.parse_reply(REPLY) == (json.loads(REPLY), False)
+
+
+def test_reply_cut_mid_value_drops_the_half_written_pair():
+    data, repaired = llm_prompt.parse_reply(cut_inside("Main Hall"))
+    assert repaired
+    assert data == {"title": "Tech Fest"}
+
+
+def test_reply_cut_mid_date_keeps_earlier_fields():
+    data, repaired = llm_prompt.parse_reply(cut_inside("2025-12-28"))
+    assert repaired
+    assert data == {"title": "Tech Fest", "venue_name": "Main Hall"}
+    assert "event_date" not in data
+
+
+def test_reply_cut_mid_key_drops_it():
+    text = REPLY[:REPLY.index('"event_date"') + 5]
+    data, _ = llm_prompt.parse_reply(text)
+    assert data == {"title": "Tech Fest", "venue_name": "Main Hall"}
+
+
+def test_reply_cut_inside_an_array_keeps_whole_items():
+    data, _ = llm_prompt.parse_reply(cut_inside("fest"))
+    assert data["tags"] == ["tech"]
+
+
+def test_reply_cut_after_a_value_is_closed_in_place():
+    text = REPLY[:REPLY.index(', "tags"')]
+    data, repaired = llm_prompt.parse_reply(text)
+    assert repaired
+    assert data == {"title": "Tech Fest", "venue_name": "Main Hall", "event_date": "2025-12-28"}
+
+
+def test_reply_cut_in_the_first_value_is_invalid():
+    assert llm_prompt.parse_reply(cut_inside("Tech Fest")) == (None, False)
+
+
+def test_wrapped_reply_is_unwrapped():
+    data, repaired = llm_prompt.parse_reply(f"Here you go:\n```json\n{REPLY}\n```")
+    assert repaired
+    assert data == json.loads(REPLY)
+
+
+def test_fit_ocr_text_drops_repeats_and_keeps_top_and_bottom():
+    lines = ["TECH FEST 2025", "Tech  Fest 2025"] + [f"Speaker {i} on something" for i in range(100)] + ["Contact: fest@iut.edu"]
+    text, info = llm_prompt.fit_ocr_text("\n".join(lines), max_tokens=100)
+    kept = text.splitlines()
+    assert kept[0] == "TECH FEST 2025"
+    assert kept[-1] == "Contact: fest@iut.edu"
+    assert info["duplicate_lines"] == 1
+    assert info["trimmed_lines"] > 0
+    assert info["tokens_out"] <= 100 + 1
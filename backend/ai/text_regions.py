@@ -0,0 +1,114 @@
+"""
+Cheap text layout estimate used to size OCR per image
+Finds text-like components on a small thumbnail to crop away empty decoration
+and pick EasyOCR's canvas_size / mag_ratio from the typical character height
+"""
+import math
+
+import cv2
+import numpy as np
+
+THUMB_SIZE = 512
+# CRAFT detects reliably once characters are roughly this tall (pixels, after mag_ratio)
+TARGET_CHAR_HEIGHT = 16
+MIN_MAG_RATIO = 0.35
+MAX_MAG_RATIO = 2.0
+MAX_CANVAS_SIZE = 2560
+# Below this many character-like components the estimate is too noisy to act on
+MIN_COMPONENTS = 4
+SMALL_TEXT_PERCENTILE = 20
+MIN_BLOB_HEIGHT = 3  # Thumbnail pixels
+
+
+class LayoutPlan:
+    """Where to run OCR and at what scale"""
+
+    def __init__(self, box=None, char_height=0.0, text_density=0.0, canvas_size=MAX_CANVAS_SIZE, mag_ratio=1.0):
+        self.box = box  # (x0, y0, x1, y1) in image pixels, None = whole image
+        self.char_height = char_height
+        self.text_density = text_density
+        self.canvas_size = canvas_size
+        self.mag_ratio = mag_ratio
+
+    def to_dict(self):
+        return {
+            "box": list(self.box) if self.box else None,
+            "char_height": self.char_height,
+            "text_density": self.text_density,
+            "canvas_size": self.canvas_size,
+            "mag_ratio": self.mag_ratio
+        }
+
+
+DEFAULT_PLAN = LayoutPlan()
+
+
+def _character_boxes(thumb):
+    """Bounding boxes (x, y, w, h) of character-sized blobs in a grayscale thumbnail"""
+    # Morphological gradient lights up stroke edges whatever the text/background colours
+    gradient = cv2.morphologyEx(thumb, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+    height, width = thumb.shape[:2]
+    boxes = []
+    for x, y, w, h, area in stats[1:count]:
+        if h < MIN_BLOB_HEIGHT or h > height / 3 or w > width / 2:
+            continue  # Specks and large shapes/photos
+        if not 0.1 <= w / h <= 15 or area < 0.15 * w * h:
+            continue  # Rules/lines and sparse outlines (letters of a word often merge at this size)
+        boxes.append((x, y, w, h))
+    return boxes
+
+
+def estimate_layout(gray, thumb_size=THUMB_SIZE):
+    """LayoutPlan for a grayscale image, or DEFAULT_PLAN when no text is evident"""
+    height, width = gray.shape[:2]
+    scale = min(1.0, thumb_size / max(height, width))
+    thumb = gray if scale == 1.0 else cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    boxes = _character_boxes(thumb)
+    if len(boxes) < MIN_COMPONENTS:
+        return DEFAULT_PLAN
+
+    # A low percentile rather than the median, so small print next to a big
+    # headline still gets enough magnification to be detected
+    heights = np.array([h for _, _, _, h in boxes], dtype=np.float32)
+    char_height = float(np.percentile(heights, SMALL_TEXT_PERCENTILE)) / scale
+    text_area = sum(w * h for _, _, w, h in boxes) / (scale * scale)
+
+    # Union of text blobs plus a margin, so edge characters the thumbnail missed survive
+    xs = [x for x, _, _, _ in boxes] + [x + w for x, _, w, _ in boxes]
+    ys = [y for _, y, _, _ in boxes] + [y + h for _, y, _, h in boxes]
+    margin = max(2 * char_height, 0.02 * max(height, width))
+    x0 = max(0, int(min(xs) / scale - margin))
+    y0 = max(0, int(min(ys) / scale - margin))
+    x1 = min(width, int(math.ceil(max(xs) / scale + margin)))
+    y1 = min(height, int(math.ceil(max(ys) / scale + margin)))
+    box = (x0, y0, x1, y1)
+    if (x1 - x0) * (y1 - y0) > 0.9 * width * height:
+        box = None  # Not worth a copy
+
+    crop_long_side = max(x1 - x0, y1 - y0) if box else max(height, width)
+    mag_ratio = min(MAX_MAG_RATIO, max(MIN_MAG_RATIO, TARGET_CHAR_HEIGHT / max(char_height, 1.0)))
+    if scale < 1.0 and char_height <= MIN_BLOB_HEIGHT / scale:
+        # Text as small as the thumbnail can resolve may be smaller still - don't shrink,
+        # but don't upscale on a guess either
+        mag_ratio = 1.0
+    canvas_size = min(MAX_CANVAS_SIZE, int(math.ceil(crop_long_side * mag_ratio / 32)) * 32)
+
+    return LayoutPlan(
+        box=box,
+        char_height=round(char_height, 1),
+        text_density=round(float(min(1.0, text_area / (width * height))), 3),
+        canvas_size=max(canvas_size, 256),
+        mag_ratio=round(mag_ratio, 2)
+    )
+
+
+def crop(image, box):
+    """Contiguous copy of image inside box (no-op for None)"""
+    if box is None:
+        return image
+    x0, y0, x1, y1 = box
+    return np.ascontiguousarray(image[y0:y1, x0:x1])
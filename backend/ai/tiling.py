@@ -0,0 +1,106 @@
+"""
+Tiling for banners too large to OCR in one piece without losing small text
+Splits an image into overlapping native-resolution tiles, then maps the per-tile
+EasyOCR results back to image coordinates, drops the copies of boxes that fall
+in a seam and returns them in reading order
+"""
+import math
+
+import numpy as np
+
+TILE_SIZE = 1536
+# Long side tiled banners are decoded at (bounds memory for absurd uploads)
+MAX_NATIVE_SIZE = 12000
+# Wider than the tallest text line we expect, so every line is whole in some tile
+TILE_OVERLAP = 192
+# Boxes from different tiles sharing this much of the smaller box are the same text
+DUPLICATE_OVERLAP = 0.5
+BAND_HEIGHT = 128
+
+
+def _spans(length, tile_size, overlap):
+    """Evenly spaced [start, end) spans covering length with at least overlap between neighbours"""
+    if length <= tile_size:
+        return [(0, length)]
+    count = math.ceil((length - overlap) / (tile_size - overlap))
+    step = (length - tile_size) / (count - 1)
+    return [(int(round(i * step)), int(round(i * step)) + tile_size) for i in range(count)]
+
+
+def tile_grid(height, width, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Tile boxes (x0, y0, x1, y1) in row-major order"""
+    return [
+        (x0, y0, x1, y1)
+        for y0, y1 in _spans(height, tile_size, overlap)
+        for x0, x1 in _spans(width, tile_size, overlap)
+    ]
+
+
+def offset_results(results, x0, y0):
+    """EasyOCR (bbox, text, prob) results shifted from tile to image coordinates"""
+    return [
+        ([[float(x) + x0, float(y) + y0] for x, y in bbox], text, prob)
+        for bbox, text, prob in results
+    ]
+
+
+def _bounds(bbox):
+    xs = [x for x, _ in bbox]
+    ys = [y for _, y in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _area(bounds):
+    x0, y0, x1, y1 = bounds
+    return max(0.0, x1 - x0) * max(0.0, y1 - y0)
+
+
+def _shared(a, b):
+    """Intersection area over the smaller box's area"""
+    inter = _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+    smaller = min(_area(a), _area(b))
+    return inter / smaller if smaller else 0.0
+
+
+def merge_tiles(tile_results, duplicate_overlap=DUPLICATE_OVERLAP):
+    """Combine per-tile results (already in image coordinates) into one list
+
+    A line crossing a seam is read by both tiles, once whole and once cut off;
+    of boxes from different tiles that mostly overlap, the larger (the whole
+    line) is kept, with confidence breaking ties.
+    """
+    candidates = []
+    for tile_index, results in enumerate(tile_results):
+        for bbox, text, prob in results:
+            candidates.append((_bounds(bbox), tile_index, (bbox, text, prob)))
+    # Largest first, so a cut-off copy always meets its whole line already kept
+    candidates.sort(key=lambda c: (_area(c[0]), c[2][2]), reverse=True)
+
+    kept = []
+    rows = {}  # Kept boxes by horizontal band, so each box is only compared with its neighbours
+    for bounds, tile_index, result in candidates:
+        bands = range(int(bounds[1] // BAND_HEIGHT), int(bounds[3] // BAND_HEIGHT) + 1)
+        if any(other_tile != tile_index and _shared(bounds, other) > duplicate_overlap
+               for band in bands for other, other_tile in rows.get(band, ())):
+            continue
+        kept.append(result)
+        for band in bands:
+            rows.setdefault(band, []).append((bounds, tile_index))
+    return reading_order(kept)
+
+
+def reading_order(results):
+    """Results sorted into lines (top to bottom), left to right within a line"""
+    if not results:
+        return []
+    boxes = [(_bounds(bbox), (bbox, text, prob)) for bbox, text, prob in results]
+    line_height = float(np.median([b[3] - b[1] for b, _ in boxes]))
+
+    lines = []
+    for bounds, result in sorted(boxes, key=lambda b: (b[0][1] + b[0][3]) / 2):
+        center = (bounds[1] + bounds[3]) / 2
+        if lines and center - lines[-1][0] <= line_height / 2:
+            lines[-1][1].append((bounds, result))
+        else:
+            lines.append((center, [(bounds, result)]))
+    return [result for _, line in lines for _, result in sorted(line, key=lambda b: b[0][0])]
@@ -0,0 +1,110 @@
+"""
+Opt-in per-request tracing for diagnosing slow analyses
+Spans are plain dicts in Chrome trace-event format (so they survive the trip
+back from worker processes); a stack sampler can add a flamegraph profile
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def make_span(name, start, end=None, **args):
+    """Chrome 'complete' event for [start, end] (time.time() seconds) on this thread"""
+    end = time.time() if end is None else end
+    return {
+        "name": name,
+        "ph": "X",
+        "ts": int(start * 1e6),
+        "dur": max(0, int((end - start) * 1e6)),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args
+    }
+
+
+def should_trace(header_value, sample_rate):
+    """True when the request asked for a trace or falls into the sample"""
+    if header_value and header_value.lower() not in ("0", "false", "off"):
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer, counting folded stacks"""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stop sampling; returns {folded stack: sample count}"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return dict(self.samples)
+
+
+def chrome_trace(spans, metadata=None):
+    """Trace-event JSON loadable in chrome://tracing or ui.perfetto.dev"""
+    events = list(spans)
+    for pid, tid in {(span["pid"], span["tid"]) for span in spans}:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"thread {tid}"}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "metadata": metadata or {}}
+
+
+def write_trace(directory, name, spans, profile=None, metadata=None):
+    """Write <name>.trace.json (and <name>.folded for a profile); returns the trace path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.trace.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(spans, metadata), f)
+    if profile:
+        # Folded stacks: flamegraph.pl, speedscope and inferno all read this
+        with open(os.path.join(directory, f"{name}.folded"), 'w', encoding='utf-8') as f:
+            for stack, count in sorted(profile.items()):
+                f.write(f"{stack} {count}\n")
+    return path
+
+
+def prune_traces(directory, max_traces):
+    """Delete the oldest traces (and their profiles) beyond max_traces; returns how many went"""
+    try:
+        traces = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith(".trace.json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+    except FileNotFoundError:
+        return 0
+    stale = traces[:max(0, len(traces) - max_traces)]
+    for entry in stale:
+        name = entry.path[:-len(".trace.json")]
+        for path in (entry.path, f"{name}.folded"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return len(stale)
@@ -0,0 +1,246 @@
+"""
+Supervised multi-process pool of banner analyzers
+Each worker process loads the OCR models once; image bytes are handed over
+through shared memory and requests go to the least-busy worker. The byte after
+the image is a cancel flag the worker's analysis polls at its checkpoints.
+Each worker sends results over its own pipe, so a worker that dies mid-send
+can't leave a lock held that the other workers need
+"""
+import itertools
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+
+class _SharedFlag:
+    """threading.Event-style view of a task's cancel byte, for analyze(cancel=...)"""
+
+    def __init__(self, shm, offset):
+        self.shm = shm
+        self.offset = offset
+
+    def is_set(self):
+        return self.shm.buf[self.offset] != 0
+
+
+def _worker_main(worker_id, tasks, results, analyzer_config):
+    """Worker process: build the analyzer once, then serve tasks until None
+
+    results is this worker's end of its own pipe to the pool.
+    """
+    from banner_analyzer import BannerAnalyzer
+
+    print(f"👷 Worker {worker_id} starting...", file=sys.stderr)
+    analyzer = BannerAnalyzer.from_config(analyzer_config)
+    try:
+        analyzer.warm_up()
+        # task_id None tells the parent this worker is warm
+        results.send((None, True, "ready"))
+        print(f"✅ Worker {worker_id} ready", file=sys.stderr)
+    except Exception as e:
+        print(f"⚠️  Worker {worker_id} warm-up failed, models load on first use: {e}", file=sys.stderr)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            analyzer.scheduler.flush()
+            break
+        task_id, shm_name, size, options = task
+        try:
+            # Spawned workers share the parent's resource tracker, so attaching
+            # here doesn't take ownership - the parent unlinks after the result
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                content = bytes(shm.buf[:size])
+                result = analyzer.analyze(content, cancel=_SharedFlag(shm, size), **options)
+            finally:
+                shm.close()
+            results.send((task_id, True, result))
+        except Exception as e:
+            print(f"❌ Worker {worker_id} task failed: {e}", file=sys.stderr)
+            results.send((task_id, False, str(e)))
+
+
+class _Worker:
+    def __init__(self, worker_id, process, tasks, results):
+        self.id = worker_id
+        self.process = process
+        self.tasks = tasks
+        self.results = results  # Receiving end of this worker's result pipe
+        self.in_flight = {}  # task_id -> (future, shared memory, image size, cancel event)
+        self.restarts = 0
+        self.ready = False  # Set once the worker has warmed up its models
+
+
+class WorkerPool:
+    def __init__(self, size, analyzer_config, supervise_interval=1.0):
+        """Initialize pool
+
+        Args:
+            size: Number of analyzer processes
+            analyzer_config: Settings dict passed to BannerAnalyzer.from_config in each worker
+            supervise_interval: Seconds between checks for crashed workers
+        """
+        self.size = size
+        self.analyzer_config = analyzer_config
+        self.supervise_interval = supervise_interval
+        # spawn: fork is unsafe with torch/OpenCV threads and unavailable on Windows
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for worker_id in range(self.size):
+            self._workers.append(self._spawn(worker_id))
+        for target, name in ((self._collect, "pool-collector"), (self._supervise, "pool-supervisor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🏭 Worker pool started with {self.size} processes", file=sys.stderr)
+
+    def _spawn(self, worker_id):
+        tasks = self._ctx.Queue()
+        results, child_results = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, tasks, child_results, self.analyzer_config),
+            name=f"analyzer-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        # Only the worker writes; closing our copy lets recv() see EOF if it dies
+        child_results.close()
+        return _Worker(worker_id, process, tasks, results)
+
+    def submit(self, content, cancel=None, **options):
+        """Queue image bytes on the least-busy worker; returns a Future of the result dict
+        
+        options are passed to BannerAnalyzer.analyze in the worker (e.g. tracing=True).
+        Setting cancel (a threading.Event) raises the task's shared cancel flag.
+        """
+        future = Future()
+        shm = shared_memory.SharedMemory(create=True, size=len(content) + 1)
+        shm.buf[:len(content)] = content
+        # Already cancelled: the worker gives up at its first checkpoint
+        shm.buf[len(content)] = 1 if cancel is not None and cancel.is_set() else 0
+        with self._lock:
+            worker = min(self._workers, key=lambda w: len(w.in_flight))
+            task_id = next(self._task_ids)
+            worker.in_flight[task_id] = (future, shm, len(content), cancel)
+            worker.tasks.put((task_id, shm.name, len(content), options))
+        return future
+
+    def analyze(self, content, **options):
+        """Blocking analysis on a worker process"""
+        return self.submit(content, **options).result()
+
+    def _finish(self, worker, task_id):
+        """Pop a task and release its shared memory (caller holds the lock)"""
+        future, shm, _, _ = worker.in_flight.pop(task_id)
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        return future
+
+    def _propagate_cancels(self):
+        """Raise the shared flag of tasks whose cancel event has been set"""
+        with self._lock:
+            for worker in self._workers:
+                for _, shm, size, cancel in worker.in_flight.values():
+                    if cancel is not None and cancel.is_set() and not shm.buf[size]:
+                        shm.buf[size] = 1
+
+    def _collect(self):
+        dead = set()  # Pipes at EOF, skipped until the supervisor replaces their worker
+        while not self._stop.is_set():
+            self._propagate_cancels()
+            with self._lock:
+                workers = {w.results: w for w in self._workers if w.results not in dead}
+            dead &= {w.results for w in self._workers}
+            if not workers:
+                self._stop.wait(0.5)
+                continue
+            try:
+                ready = wait(list(workers), timeout=0.5)
+            except (OSError, ValueError):
+                continue  # A pipe was closed by a restart while we waited
+            for connection in ready:
+                worker = workers[connection]
+                try:
+                    task_id, ok, payload = connection.recv()
+                except (EOFError, OSError):
+                    dead.add(connection)  # Worker died (maybe mid-send); the supervisor restarts it
+                    continue
+                with self._lock:
+                    if task_id is None:
+                        worker.ready = True
+                        continue
+                    if task_id not in worker.in_flight:
+                        continue  # Already failed by the supervisor
+                    future = self._finish(worker, task_id)
+                if ok:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+
+    def _supervise(self):
+        while not self._stop.wait(self.supervise_interval):
+            for index, worker in enumerate(list(self._workers)):
+                if worker.process.is_alive():
+                    continue
+                print(f"💥 Worker {worker.id} died (exit code {worker.process.exitcode}), restarting", file=sys.stderr)
+                with self._lock:
+                    failed = [self._finish(worker, task_id) for task_id in list(worker.in_flight)]
+                    # Whatever the dead worker left in its pipe goes with it
+                    worker.results.close()
+                    replacement = self._spawn(worker.id)
+                    replacement.restarts = worker.restarts + 1
+                    self._workers[index] = replacement
+                for future in failed:
+                    future.set_exception(RuntimeError(f"Analyzer worker {worker.id} crashed"))
+
+    def ready(self):
+        """True once every worker is alive with its models warmed up"""
+        with self._lock:
+            return all(w.ready and w.process.is_alive() for w in self._workers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "processes": self.size,
+                "workers": [
+                    {
+                        "id": w.id,
+                        "pid": w.process.pid,
+                        "alive": w.process.is_alive(),
+                        "ready": w.ready,
+                        "in_flight": len(w.in_flight),
+                        "restarts": w.restarts
+                    }
+                    for w in self._workers
+                ]
+            }
+
+    def shutdown(self, timeout=5):
+        self._stop.set()
+        for worker in self._workers:
+            worker.tasks.put(None)
+        deadline = time.time() + timeout
+        for worker in self._workers:
+            worker.process.join(max(0, deadline - time.time()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            for worker in self._workers:
+                for task_id in list(worker.in_flight):
+                    self._finish(worker, task_id).cancel()
+                worker.results.close()
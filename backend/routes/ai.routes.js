@@ -42,6 +42,16 @@ const upload = multer({
   }
 });
 
+// Relay an overload (429/503) or oversized image (413) answer, keeping Retry-After
+const relayRejection = (res, status, detail, retryAfter) => {
+  if (retryAfter) res.set('Retry-After', String(retryAfter));
+  return res.status(status).json({
+    success: false,
+    error: status === 413 ? 'Banner image too large' : 'AI server is busy, please retry shortly',
+    details: detail
+  });
+};
+
 // POST /api/ai/analyze-banner - Send to FastAPI server
 router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
   if (!req.file) {
@@ -51,9 +61,17 @@ router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
   const imagePath = req.file.path;
   console.log('Analyzing banner:', imagePath);
 
+  // Browser went away: abort the FastAPI call, which cancels the analysis there
+  const controller = new AbortController();
+  res.on('close', () => {
+    if (!res.writableFinished) controller.abort();
+  });
+  let axios;
+  let statusUrl;
+
   try {
     // Import axios and FormData dynamically (ESM)
-    const axios = (await import('axios')).default;
+    axios = (await import('axios')).default;
     const FormData = (await import('form-data')).default;
 
     // Send to FastAPI server
@@ -62,11 +80,34 @@ router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
 
     console.log('📤 Sending to FastAPI server (port 5001)...');
 
-    const response = await axios.post('http://localhost:5001/analyze', formData, {
+    // Wait up to 110s for the result; if the job is still running we get a 202 and poll
+    let response = await axios.post('http://localhost:5001/analyze?wait=110', formData, {
       headers: formData.getHeaders(),
-      timeout: 120000  // 120s timeout (first load takes longer)
+      timeout: 120000,  // 120s timeout (first load takes longer)
+      signal: controller.signal
     });
 
+    if (response.status === 202) {
+      statusUrl = `http://localhost:5001${response.data.status_url}`;
+      const deadline = Date.now() + 120000;
+      let job = response.data;
+
+      while ((job.status === 'queued' || job.status === 'running') && Date.now() < deadline) {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        job = (await axios.get(statusUrl, { timeout: 5000, signal: controller.signal })).data;
+      }
+
+      if (job.status === 'expired') {
+        // Sat in the AI server's queue past its deadline - it's overloaded
+        fs.unlink(imagePath, () => {});
+        return relayRejection(res, 503, job.error);
+      }
+      if (job.status !== 'done') {
+        throw new Error(job.error || 'Analysis timed out');
+      }
+      response = { data: job.result };
+    }
+
     console.log('✅ Analysis complete!');
 
     // Clean up uploaded file after processing
@@ -77,7 +118,10 @@ router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
     res.json(response.data);
 
   } catch (error) {
-    console.error('Analysis error:', error.message);
+    // Nobody will read a job we stopped waiting for - cancel it (no-op once finished)
+    if (statusUrl) {
+      axios.delete(statusUrl, { timeout: 5000 }).catch(() => {});
+    }
 
     // Clean up file on error
     if (fs.existsSync(imagePath)) {
@@ -86,6 +130,17 @@ router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
       });
     }
 
+    if (controller.signal.aborted) {
+      console.log('🛑 Client disconnected, analysis cancelled');
+      return;
+    }
+    console.error('Analysis error:', error.message);
+
+    // Overloaded or oversized: pass the AI server's answer through so clients can back off
+    if (error.response && [413, 429, 503].includes(error.response.status)) {
+      return relayRejection(res, error.response.status, error.response.data?.detail, error.response.headers['retry-after']);
+    }
+
     // Check if it's a connection error
     if (error.code === 'ECONNREFUSED') {
       return res.status(503).json({
@@ -102,6 +157,80 @@ router.post('/analyze-banner', upload.single('banner'), async (req, res) => {
   }
 });
 
+// POST /api/ai/analyze-banner/stream - Relay NDJSON progress events from FastAPI
+router.post('/analyze-banner/stream', upload.single('banner'), async (req, res) => {
+  if (!req.file) {
+    return res.status(400).json({ success: false, error: 'No banner image uploaded' });
+  }
+
+  const imagePath = req.file.path;
+  const cleanup = () => {
+    fs.unlink(imagePath, (err) => {
+      if (err && err.code !== 'ENOENT') console.error('Error deleting temp file:', err);
+    });
+  };
+
+  // Browser went away before the stream started (e.g. while queued): abort the request
+  const controller = new AbortController();
+  res.on('close', () => controller.abort());
+
+  try {
+    const axios = (await import('axios')).default;
+    const FormData = (await import('form-data')).default;
+
+    const formData = new FormData();
+    formData.append('file', fs.createReadStream(imagePath));
+
+    console.log('📤 Streaming analysis from FastAPI server (port 5001)...');
+
+    // No axios timeout: events keep flowing, and the browser decides when to give up
+    const response = await axios.post('http://localhost:5001/analyze/stream', formData, {
+      headers: formData.getHeaders(),
+      responseType: 'stream',
+      signal: controller.signal
+    });
+
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.setHeader('X-Accel-Buffering', 'no');
+
+    response.data.pipe(res);
+    response.data.on('end', cleanup);
+    response.data.on('error', (err) => {
+      console.error('Stream error:', err.message);
+      cleanup();
+      res.end();
+    });
+    // Browser went away - close the FastAPI stream, which cancels the analysis
+    res.on('close', () => response.data.destroy());
+
+  } catch (error) {
+    cleanup();
+    if (controller.signal.aborted) {
+      console.log('🛑 Client disconnected, analysis cancelled');
+      return;
+    }
+    console.error('Analysis error:', error.message);
+
+    if (error.response && [413, 429, 503].includes(error.response.status)) {
+      return relayRejection(res, error.response.status, undefined, error.response.headers['retry-after']);
+    }
+
+    if (error.code === 'ECONNREFUSED') {
+      return res.status(503).json({
+        success: false,
+        error: 'AI server not running. Please start: python ai/ai_server.py'
+      });
+    }
+
+    res.status(500).json({
+      success: false,
+      error: 'Banner analysis failed',
+      details: error.message
+    });
+  }
+});
+
 // GET /api/ai/status - Check if AI service is available
 router.get('/status', async (req, res) => {
   try {
@@ -58,6 +58,7 @@ export const API_ENDPOINTS = {
     
     // AI Banner Analysis
     AI_ANALYZE_BANNER: `${API_BASE_URL}/api/ai/analyze-banner`,
+    AI_ANALYZE_BANNER_STREAM: `${API_BASE_URL}/api/ai/analyze-banner/stream`,
     AI_STATUS: `${API_BASE_URL}/api/ai/status`,
 };
 
@@ -9,6 +9,8 @@ const BannerAnalyzer = ({ onDataExtracted, onClose }) => {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [analysisResult, setAnalysisResult] = useState(null);
   const [error, setError] = useState(null);
+  const [progress, setProgress] = useState(null);
+  const [ocrText, setOcrText] = useState('');
 
   const handleFileSelect = (e) => {
     const file = e.target.files[0];
@@ -40,22 +42,48 @@ const BannerAnalyzer = ({ onDataExtracted, onClose }) => {
 
     setIsAnalyzing(true);
     setError(null);
+    setProgress('Uploading banner...');
+    setOcrText('');
 
     try {
       const formData = new FormData();
       formData.append('banner', selectedFile);
 
-      const response = await fetch(API_ENDPOINTS.AI_ANALYZE_BANNER, {
+      const response = await fetch(API_ENDPOINTS.AI_ANALYZE_BANNER_STREAM, {
         method: 'POST',
         body: formData
       });
 
-      const data = await response.json();
-
-      if (!response.ok || !data.success) {
+      if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
         throw new Error(data.error || 'Analysis failed');
       }
 
+      // NDJSON: one progress event per line, ending with the result
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let data = null;
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (line.trim()) {
+            data = handleStreamEvent(JSON.parse(line)) || data;
+          }
+        }
+      }
+
+      if (!data || !data.success) {
+        throw new Error((data && data.error) || 'Analysis failed');
+      }
+
       setAnalysisResult(data);
       toast.success('Banner analyzed successfully!');
     } catch (err) {
@@ -64,9 +92,36 @@ const BannerAnalyzer = ({ onDataExtracted, onClose }) => {
       toast.error(err.message || 'Failed to analyze banner');
     } finally {
       setIsAnalyzing(false);
+      setProgress(null);
     }
   };
 
+  // Update progress from a stream event; returns the final result/error event
+  const handleStreamEvent = (event) => {
+    switch (event.event) {
+      case 'queued':
+        setProgress('Waiting for the analyzer...');
+        break;
+      case 'decoded':
+        setProgress('Reading text from banner...');
+        break;
+      case 'ocr_strategy':
+        setProgress(`Reading text (${event.strategy.replace(/_/g, ' ')}: ${event.confidence}% confidence)...`);
+        break;
+      case 'ocr_result':
+        setOcrText(event.text);
+        setProgress('Extracting event details...');
+        break;
+      case 'result':
+        return event;
+      case 'error':
+        return { success: false, error: event.error };
+      default:
+        break;
+    }
+    return null;
+  };
+
   const useExtractedData = () => {
     if (!analysisResult || !analysisResult.event_data) {
       toast.error('No data to use');
@@ -172,6 +227,20 @@ const BannerAnalyzer = ({ onDataExtracted, onClose }) => {
                 )}
               </div>
 
+              {isAnalyzing && progress && (
+                <div className="mt-4 p-4 bg-blue-50 border border-blue-200 rounded-lg">
+                  <p className="text-blue-800 font-semibold flex items-center gap-2">
+                    <FiLoader className="animate-spin" />
+                    {progress}
+                  </p>
+                  {ocrText && (
+                    <pre className="text-xs text-slate-600 mt-3 whitespace-pre-wrap max-h-40 overflow-y-auto">
+                      {ocrText}
+                    </pre>
+                  )}
+                </div>
+              )}
+
               {error && (
                 <div className="mt-4 p-4 bg-red-50 border border-red-200 rounded-lg flex items-start gap-3">
                   <FiAlertCircle className="text-red-600 mt-0.5" size={20} />